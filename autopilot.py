@@ -20,15 +20,22 @@ Codex Autopilot v3 — tmux + CLI 模式
   - 启动时自动创建/维护 tmux session
 """
 
+import atexit
 import hashlib
 import logging
 import os
+import queue
 import subprocess
 import sys
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
-from typing import Dict, Optional, Tuple
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, NamedTuple, Optional, Tuple
+
+try:
+    import xxhash
+except ImportError:  # xxhash 可选，缺失时用标准库 blake2b
+    xxhash = None
 
 # 添加 lib 到 path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -43,9 +50,12 @@ from lib.session_monitor import (
 from lib.input_sender import (
     check_codex_cli,
     check_tmux_session,
+    close_tmux_client,
+    open_tmux_client,
     send_reply,
     setup_tmux_session,
-    verify_send,
+    check_pending_verify,
+    start_pending_verify,
 )
 from lib.intent_analyzer import Intent, analyze_intent, get_intent_description
 from lib.reply_generator import (
@@ -57,22 +67,25 @@ from lib.reply_generator import (
 )
 from lib.project_scanner import format_progress, scan_project_progress
 from lib.telegram_notifier import (
-    TelegramNotifier,
+    BufferedNotifier,
     create_notifier_from_config,
     format_error_notification,
     format_send_notification,
 )
 from lib.state_manager import (
     GlobalState,
+    ProjectState,
     TaskStateInfo,
     check_cooldown,
     check_daily_limit,
     get_project_state,
     get_total_daily_sends,
-    increment_send_count,
     load_config,
     load_state,
     record_history,
+    record_send_time,
+    release_daily_send,
+    reserve_daily_send,
     save_state,
 )
 
@@ -117,9 +130,15 @@ LOG_FILE = os.path.join(LOG_DIR, "autopilot.log")
 LOG_MAX_SIZE = 1024 * 1024  # 1MB
 LOG_BACKUP_COUNT = 2
 
+# 并行处理项目的最大线程数（每个项目的工作几乎都是 I/O）
+MAX_PROJECT_WORKERS = 8
+
+# extract_codex_summary 从尾部最多检查的段落数
+SUMMARY_MAX_PARAGRAPHS = 8
 
-def setup_logging():
-    """配置日志"""
+
+def setup_logging() -> Tuple[logging.Logger, QueueListener]:
+    """配置日志：调用线程只入队，文件写入和轮转由后台 QueueListener 完成"""
     os.makedirs(LOG_DIR, exist_ok=True)
     
     root_logger = logging.getLogger()
@@ -134,19 +153,62 @@ def setup_logging():
     file_handler.setFormatter(logging.Formatter(
         '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
     ))
-    root_logger.addHandler(file_handler)
     
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(logging.Formatter(
         '%(asctime)s [%(levelname)s] %(message)s'
     ))
-    root_logger.addHandler(console_handler)
     
-    return logging.getLogger(__name__)
+    log_queue = queue.SimpleQueue()
+    root_logger.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    listener.start()
+    
+    return logging.getLogger(__name__), listener
+
+
+logger, _log_listener = setup_logging()
+# 退出时排空队列（atexit 后进先出，之后注册的清理函数产生的日志也能落盘）
+atexit.register(_log_listener.stop)
+
+
+class TickDefaults(NamedTuple):
+    """本轮 tick 的配置默认值（main 中从 config 读取一次）"""
+    cooldown: int
+    max_daily_sends: int
+    max_done_age: int
+    user_wait_timeout: int
+    loop_detection_threshold: int
+    max_consecutive_failures: int
+    max_total: int
+    verify_max: int
+    
+    @classmethod
+    def from_config(cls, config: dict) -> "TickDefaults":
+        return cls(
+            cooldown=config.get('cooldown', 120),
+            max_daily_sends=config.get('max_daily_sends', 50),
+            max_done_age=config.get('max_done_age', 7200),
+            user_wait_timeout=config.get('user_wait_timeout', 600),
+            loop_detection_threshold=config.get('loop_detection_threshold', 3),
+            max_consecutive_failures=config.get('max_consecutive_failures', 5),
+            max_total=config.get('max_daily_sends_total', 200),
+            verify_max=config.get('verify_max_wait', 30),
+        )
+    
+    def for_project(self, project: "ProjectInfo") -> "TickDefaults":
+        """合并项目级覆盖（cooldown / max_daily_sends），无覆盖时返回自身"""
+        overrides = {
+            k: project.overrides[k] for k in PROJECT_OVERRIDE_KEYS if k in project.overrides
+        }
+        return self._replace(**overrides) if overrides else self
 
 
-logger = setup_logging()
+# tasks.yaml project.overrides 中可覆盖的 TickDefaults 字段
+PROJECT_OVERRIDE_KEYS = ('cooldown', 'max_daily_sends')
 
 
 def preflight_checks(config: dict) -> bool:
@@ -162,11 +224,18 @@ def preflight_checks(config: dict) -> bool:
     return True
 
 
-def compute_output_hash(text: Optional[str]) -> Optional[str]:
-    """计算输出文本的哈希（循环检测）"""
-    if not text:
+def compute_output_hash(data: Optional[bytes]) -> Optional[int]:
+    """
+    计算输出文本的 64 位哈希（循环检测，不需要密码学强度）
+    
+    调用方传入已编码的 UTF-8 字节，只对前 500 字节取哈希
+    """
+    if not data:
         return None
-    return hashlib.md5(text[:500].encode()).hexdigest()
+    data = data[:500]
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(data)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
 
 
 def find_tasks_yaml(project_dir: str) -> Optional[str]:
@@ -186,19 +255,32 @@ def find_tasks_yaml(project_dir: str) -> Optional[str]:
 
 
 def extract_codex_summary(last_message: str, max_length: int = 200) -> str:
-    """从 Codex 输出中提取摘要"""
+    """
+    从 Codex 输出中提取摘要
+    
+    从尾部用 rfind 逐段向前找最后一个非代码段落，最多检查
+    SUMMARY_MAX_PARAGRAPHS 段，不为整条消息分配段落列表。
+    """
     if not last_message:
         return ""
     
-    paragraphs = [p.strip() for p in last_message.split('\n\n') if p.strip()]
-    if not paragraphs:
-        return last_message[:max_length]
-    
-    for para in reversed(paragraphs):
-        if not para.startswith('```') and not para.startswith('    '):
-            return para[:max_length] + ("..." if len(para) > max_length else "")
+    end = len(last_message)
+    last_para = None
+    for _ in range(SUMMARY_MAX_PARAGRAPHS):
+        start = last_message.rfind('\n\n', 0, end)
+        para = last_message[start + 2 if start >= 0 else 0:end].strip()
+        if para:
+            if last_para is None:
+                last_para = para
+            if not para.startswith(('```', '    ')):
+                return para[:max_length] + ("..." if len(para) > max_length else "")
+        if start < 0:
+            break
+        end = start
     
-    return paragraphs[-1][:max_length]
+    if last_para is None:
+        return last_message[:max_length]
+    return last_para[:max_length]
 
 
 def process_project_with_tasks(
@@ -209,7 +291,7 @@ def process_project_with_tasks(
     session,
     last_message: str,
     intent: Intent,
-    notifier: Optional[TelegramNotifier]
+    notifier: Optional[BufferedNotifier]
 ) -> Tuple[bool, Optional[str]]:
     """带任务编排的项目处理 (Phase 2)"""
     project_name = tasks_config.project_name or os.path.basename(project_dir)
@@ -309,12 +391,33 @@ def process_project_with_tasks(
     return True, None
 
 
+def _handle_unchanged_output(
+    project: ProjectInfo,
+    proj_state: ProjectState,
+    state: GlobalState,
+    notifier: Optional[BufferedNotifier],
+    loop_threshold: int,
+) -> bool:
+    """输出与上次发送时相同：达到阈值判定为循环，否则跳过本轮"""
+    if proj_state.loop_count >= loop_threshold:
+        error_msg = f"检测到循环：连续 {loop_threshold} 次相似输出"
+        logger.warning(error_msg)
+        record_history(state, "loop_detected", project.name, error=error_msg)
+        if notifier:
+            notifier.send_simple(format_error_notification(project.name, error_msg))
+        update_project_lifecycle(project, ProjectLifecycle.ERROR, state)
+    else:
+        logger.info(f"输出未变化 (loop_count={proj_state.loop_count}/{loop_threshold})")
+    return False
+
+
 def process_project(
     project: ProjectInfo,
     config: dict,
+    td: TickDefaults,
     state: GlobalState,
     sessions: Dict[str, object],
-    notifier: Optional[TelegramNotifier],
+    notifier: Optional[BufferedNotifier],
 ) -> bool:
     """
     处理单个项目
@@ -327,58 +430,83 @@ def process_project(
     logger.info(f"处理项目: {project_name} (priority={project.priority})")
     
     proj_state = get_project_state(state, project_dir)
+    td = td.for_project(project)
     
     if project.lifecycle == ProjectLifecycle.ENABLED:
         update_project_lifecycle(project, ProjectLifecycle.RUNNING, state)
     
+    # 上次发送的验证结果（在冷却期门控之前检查）
+    if proj_state.pending_verify:
+        verified = check_pending_verify(proj_state.pending_verify, td.verify_max)
+        if verified is not None:
+            logger.info("发送验证成功" if verified else "发送验证超时")
+            proj_state.pending_verify = None
+    
+    # 以下门控只用内存状态和 session mtime，全部通过后才读取 JSONL
     # 冷却期
-    cooldown = project.get_override('cooldown', config.get('cooldown', 120))
+    cooldown = td.cooldown
     if check_cooldown(proj_state, cooldown):
         logger.info(f"项目 {project_name} 在冷却期，跳过")
         return False
     
     # 每日限制
-    max_daily = project.get_override('max_daily_sends', config.get('max_daily_sends', 50))
+    max_daily = td.max_daily_sends
     if check_daily_limit(proj_state, max_daily):
         logger.warning(f"项目 {project_name} 达到每日发送限制 ({max_daily})")
         return False
     
-    # 全局限制
-    max_total = config.get('max_daily_sends_total', 200)
-    if get_total_daily_sends(state) >= max_total:
-        logger.warning(f"全局每日发送限制已达到 ({max_total})")
+    # 获取 session（字典查找，先于需要遍历所有项目的全局计数）
+    session = sessions.get(project_dir)
+    if session is None:
+        logger.info(f"项目 {project_name} 没有活跃的 Codex session")
         return False
     
-    # 获取 session
-    if project_dir not in sessions:
-        logger.info(f"项目 {project_name} 没有活跃的 Codex session")
+    # 全局限制（快速跳过；发送前还会在锁内预占名额）
+    max_total = td.max_total
+    if get_total_daily_sends(state) >= max_total:
+        logger.warning(f"全局每日发送限制已达到 ({max_total})")
         return False
     
-    session = sessions[project_dir]
     session_state = get_session_state(session)
+    session_age = session.age_seconds
     
-    logger.info(f"Session 状态: {session_state.value} (age: {session.age_seconds:.0f}s)")
+    logger.info(f"Session 状态: {session_state.value} (age: {session_age:.0f}s)")
     
     if session_state == SessionState.ACTIVE:
         logger.info(f"Codex 正在工作，跳过")
         return False
     
-    max_done_age = config.get('max_done_age', 7200)
-    if session_state == SessionState.DONE and session.age_seconds > max_done_age:
+    max_done_age = td.max_done_age
+    if session_state == SessionState.DONE and session_age > max_done_age:
         logger.info(f"Session 停止超过 {max_done_age}s，跳过")
         return False
     
-    # 检查是否刚发过回复
+    # 检查是否刚发过回复（首次读取 JSONL）
     if is_last_message_from_user(session.path):
-        user_wait_timeout = config.get('user_wait_timeout', 600)
-        if session.age_seconds < user_wait_timeout:
-            logger.info(f"等待 Codex 响应 ({session.age_seconds:.0f}s/{user_wait_timeout}s)")
+        user_wait_timeout = td.user_wait_timeout
+        if session_age < user_wait_timeout:
+            logger.info(f"等待 Codex 响应 ({session_age:.0f}s/{user_wait_timeout}s)")
             return False
         else:
-            logger.warning(f"等待超时 ({session.age_seconds:.0f}s > {user_wait_timeout}s)，重发")
+            logger.warning(f"等待超时 ({session_age:.0f}s > {user_wait_timeout}s)，重发")
             proj_state.last_output_hash = None
             proj_state.loop_count = 0
     
+    loop_threshold = td.loop_detection_threshold
+    
+    # session 文件自上次确认输出未变化后没有修改：输出仍与 last_output_hash 相同，无需再读
+    try:
+        session_mtime_ns = os.stat(session.path).st_mtime_ns
+    except OSError:
+        session_mtime_ns = None
+    if (
+        session_mtime_ns is not None
+        and session_mtime_ns == proj_state.last_session_mtime_ns
+        and proj_state.last_output_hash is not None
+        and proj_state.loop_count > 0
+    ):
+        return _handle_unchanged_output(project, proj_state, state, notifier, loop_threshold)
+    
     # 读取最后 assistant 消息
     last_message = read_last_assistant_message(session.path)
     if not last_message:
@@ -387,34 +515,27 @@ def process_project(
     
     logger.info(f"最后输出 ({len(last_message)} 字符): {last_message[:100]}...")
     
-    # 循环检测
-    output_hash = compute_output_hash(last_message)
-    loop_threshold = config.get('loop_detection_threshold', 3)
+    # 循环检测（整段只编码一次，哈希直接切片字节）
+    last_message_bytes = last_message.encode('utf-8', 'ignore')
+    output_hash = compute_output_hash(last_message_bytes)
     
     if proj_state.last_output_hash == output_hash and proj_state.loop_count > 0:
-        if proj_state.loop_count >= loop_threshold:
-            error_msg = f"检测到循环：连续 {loop_threshold} 次相似输出"
-            logger.warning(error_msg)
-            record_history(state, "loop_detected", project_name, error=error_msg)
-            if notifier:
-                notifier.send_simple(format_error_notification(project_name, error_msg))
-            update_project_lifecycle(project, ProjectLifecycle.ERROR, state)
-            return False
-        else:
-            logger.info(f"输出未变化 (loop_count={proj_state.loop_count}/{loop_threshold})")
-            return False
+        # 只在确认输出未变化时记录 mtime，保证跳过读取的判断成立
+        proj_state.last_session_mtime_ns = session_mtime_ns
+        return _handle_unchanged_output(project, proj_state, state, notifier, loop_threshold)
+    proj_state.last_session_mtime_ns = None
     
     # 分析意图
     intent = analyze_intent(last_message)
     intent_desc = get_intent_description(intent)
-    logger.info(f"识别意图: {intent.value} ({intent_desc})")
+    logger.info(f"识别意图: {intent.label} ({intent_desc})")
     
     # 任务编排
     tasks_config = project.tasks_config
     if not tasks_config:
-        tasks_yaml_path = find_tasks_yaml(project_dir)
-        if tasks_yaml_path:
-            tasks_config = load_tasks(tasks_yaml_path)
+        tasks_yaml = find_tasks_yaml(project_dir)
+        if tasks_yaml:
+            tasks_config = load_tasks(tasks_yaml)
     
     reply = None
     
@@ -436,17 +557,23 @@ def process_project(
     
     logger.info(f"生成回复: {reply[:100]}...")
     
+    # 全局限制：同批项目并行处理，发送前在锁内检查并预占名额
+    if not reserve_daily_send(state, proj_state, max_total):
+        logger.warning(f"全局每日发送限制已达到 ({max_total})")
+        return False
+    
     # 发送回复（tmux → CLI fallback）
     session_id = getattr(session, 'session_id', None)
     
     if not send_reply(reply, project_name, session_id, project_dir, config):
+        release_daily_send(state, proj_state)
         error_msg = "发送回复失败"
         logger.error(error_msg)
         proj_state.consecutive_failures += 1
-        record_history(state, "send_failed", project_name, intent.value, reply,
+        record_history(state, "send_failed", project_name, intent.label, reply,
                        success=False, error=error_msg)
         
-        max_failures = config.get('max_consecutive_failures', 5)
+        max_failures = td.max_consecutive_failures
         if proj_state.consecutive_failures >= max_failures:
             error_msg = f"连续失败 {max_failures} 次"
             if notifier:
@@ -456,8 +583,8 @@ def process_project(
     
     # 发送成功
     proj_state.consecutive_failures = 0
-    increment_send_count(proj_state)
-    record_history(state, "send", project_name, intent.value, reply)
+    record_send_time(proj_state)
+    record_history(state, "send", project_name, intent.label, reply)
     
     # 循环检测更新
     if proj_state.last_output_hash == output_hash:
@@ -479,13 +606,8 @@ def process_project(
     if notifier:
         notifier.send_simple(format_send_notification(project_name, reply[:200], intent_desc))
     
-    # 验证发送
-    verify_poll = config.get('verify_poll_interval', 5)
-    verify_max = config.get('verify_max_wait', 30)
-    if verify_send(session.path, verify_poll, verify_max):
-        logger.info("发送验证成功")
-    else:
-        logger.info("发送验证超时")
+    # 验证发送：只记录发送前的文件大小，下个 tick 再检查，不阻塞本轮
+    proj_state.pending_verify = start_pending_verify(session.path)
     
     return True
 
@@ -555,9 +677,13 @@ def main():
     state = load_state()
     state.last_tick_at = datetime.now().isoformat()
     if not state.started_at:
-        state.started_at = datetime.now().isoformat()
+        state.started_at = state.last_tick_at
     
     notifier = create_notifier_from_config(config)
+    if notifier:
+        # 本轮通知先缓冲，退出前合并发送（覆盖所有提前 return 的路径）
+        notifier = BufferedNotifier(notifier)
+        atexit.register(notifier.flush)
     command_handler = create_command_handler_from_config(config)
     
     # 预检
@@ -581,6 +707,11 @@ def main():
     sessions = discover_sessions(project_dirs)
     logger.info(f"发现 {len(sessions)} 个活跃 session")
     
+    # 本轮 tmux 命令复用一个控制模式连接（session 尚不存在时由
+    # setup_tmux_session 在创建后建立）
+    open_tmux_client(config)
+    atexit.register(close_tmux_client)
+    
     # 确保 tmux session 存在（自动创建/维护）
     ensure_tmux_sessions(projects, sessions, config)
     
@@ -601,32 +732,41 @@ def main():
         save_state(state)
         return
     
-    # 处理项目
+    # 处理项目：每批提交剩余发送名额数量的项目并行处理，
+    # 名额未用完（有项目跳过）再取下一批
     sends_this_tick = 0
     max_sends_per_tick = config.get('scheduler', {}).get('max_sends_per_tick', 1)
-    inter_project_delay = config.get('scheduler', {}).get('inter_project_delay', 5)
-    
-    for project in scheduled_projects:
-        if sends_this_tick >= max_sends_per_tick:
-            logger.info(f"达到单次 tick 发送限制 ({max_sends_per_tick})")
-            break
-        
-        max_total = config.get('max_daily_sends_total', 200)
-        if get_total_daily_sends(state) >= max_total:
-            logger.warning(f"全局每日发送限制已达到 ({max_total})")
-            if notifier:
-                notifier.send_simple("⚠️ 全局每日发送上限已达到")
-            break
-        
-        try:
-            if process_project(project, config, state, sessions, notifier):
-                sends_this_tick += 1
-                if sends_this_tick < max_sends_per_tick and inter_project_delay > 0:
-                    time.sleep(inter_project_delay)
-        except Exception as e:
-            logger.exception(f"处理项目 {project.name} 异常: {e}")
-            record_history(state, "error", project.name,
-                           error=str(e), success=False)
+    td = TickDefaults.from_config(config)
+    max_total = td.max_total
+    pending = list(scheduled_projects)
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_PROJECT_WORKERS, max_sends_per_tick))) as executor:
+        while pending:
+            if sends_this_tick >= max_sends_per_tick:
+                logger.info(f"达到单次 tick 发送限制 ({max_sends_per_tick})")
+                break
+            
+            if get_total_daily_sends(state) >= max_total:
+                logger.warning(f"全局每日发送限制已达到 ({max_total})")
+                if notifier:
+                    notifier.send_simple("⚠️ 全局每日发送上限已达到")
+                break
+            
+            batch_size = max_sends_per_tick - sends_this_tick
+            batch, pending = pending[:batch_size], pending[batch_size:]
+            futures = {
+                executor.submit(process_project, project, config, td, state, sessions, notifier): project
+                for project in batch
+            }
+            for future in as_completed(futures):
+                project = futures[future]
+                try:
+                    if future.result():
+                        sends_this_tick += 1
+                except Exception as e:
+                    logger.exception(f"处理项目 {project.name} 异常: {e}")
+                    record_history(state, "error", project.name,
+                                   error=str(e), success=False)
     
     save_state(state)
     
@@ -10,15 +10,25 @@ Session Catchup Script - 会话恢复工具
 适配: Claude Code / Gemini CLI (可根据实际存储路径修改)
 """
 
-import json
+import re
 import sys
 import os
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 
+# 复用仓库 lib/ 中的解析器（脚本位于 development/scripts/，仓库根目录在上两级）
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from lib.parsers import json_loads as _json_loads
+
 # Planning 三文件
 PLANNING_FILES = ['task_plan.md', 'progress.md', 'findings.md']
 
+# 字节级预过滤：只有同时包含 tool_use 和某个 planning 文件名的行才需要解析
+_TOOL_USE_BYTES = b'"tool_use"'
+_PLANNING_BYTES_RE = re.compile(
+    b'|'.join(re.escape(pf.encode()) for pf in PLANNING_FILES)
+)
+
 
 def get_project_dir(project_path: str) -> Path:
     """
@@ -55,10 +65,10 @@ def get_sessions_sorted(project_dir: Path) -> List[Path]:
 def get_session_first_timestamp(session_file: Path) -> Optional[str]:
     """获取会话第一条消息的时间戳。"""
     try:
-        with open(session_file, 'r') as f:
+        with open(session_file, 'rb') as f:
             for line in f:
                 try:
-                    data = json.loads(line)
+                    data = _json_loads(line)
                     ts = data.get('timestamp')
                     if ts:
                         return ts
@@ -69,132 +79,150 @@ def get_session_first_timestamp(session_file: Path) -> Optional[str]:
     return None
 
 
-def scan_for_planning_update(session_file: Path) -> Tuple[int, Optional[str]]:
-    """
-    快速扫描会话文件中的 planning 文件更新。
-    返回 (行号, 文件名)，如未找到返回 (-1, None)。
-    """
-    last_update_line = -1
-    last_update_file = None
+def _planning_update_file(data: Dict) -> Optional[str]:
+    """如果该条记录是对 planning 文件的 Write/Edit，返回文件名，否则返回 None。"""
+    if data.get('type') != 'assistant':
+        return None
 
-    try:
-        with open(session_file, 'r') as f:
-            for line_num, line in enumerate(f):
-                if '"Write"' not in line and '"Edit"' not in line:
-                    continue
+    content = data.get('message', {}).get('content', [])
+    if not isinstance(content, list):
+        return None
 
-                try:
-                    data = json.loads(line)
-                    if data.get('type') != 'assistant':
-                        continue
+    update_file = None
+    for item in content:
+        if item.get('type') != 'tool_use':
+            continue
+        tool_name = item.get('name', '')
+        if tool_name not in ('Write', 'Edit'):
+            continue
 
-                    content = data.get('message', {}).get('content', [])
-                    if not isinstance(content, list):
-                        continue
+        file_path = item.get('input', {}).get('file_path', '')
+        for pf in PLANNING_FILES:
+            if file_path.endswith(pf):
+                update_file = pf
+                break
+    return update_file
 
-                    for item in content:
-                        if item.get('type') != 'tool_use':
-                            continue
-                        tool_name = item.get('name', '')
-                        if tool_name not in ('Write', 'Edit'):
-                            continue
-
-                        file_path = item.get('input', {}).get('file_path', '')
-                        for pf in PLANNING_FILES:
-                            if file_path.endswith(pf):
-                                last_update_line = line_num
-                                last_update_file = pf
-                                break
-                except json.JSONDecodeError:
-                    continue
-    except Exception:
-        pass
 
-    return last_update_line, last_update_file
+def _is_planning_candidate(line: bytes) -> bool:
+    """字节级预过滤：可能是 planning 文件更新的行"""
+    return _TOOL_USE_BYTES in line and _PLANNING_BYTES_RE.search(line) is not None
+
+
+def _may_have_planning_update(session_file: Path) -> bool:
+    """
+    整个文件的字节级预过滤：同时含 tool_use 和某个 planning 文件名才可能有更新。
+    返回 False 的会话不用逐行 JSON 解析就能确定没有 planning 更新。
+    """
+    try:
+        with open(session_file, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return False
+    return _TOOL_USE_BYTES in data and _PLANNING_BYTES_RE.search(data) is not None
+
+
+def _parse_message(msg: Dict, line_num: int, session_file: Path) -> Optional[Dict]:
+    """把一条会话记录转换为对话消息，不是有效对话消息时返回 None。"""
+    msg_type = msg.get('type')
+    is_meta = msg.get('isMeta', False)
+
+    if msg_type == 'user' and not is_meta:
+        content = msg.get('message', {}).get('content', '')
+        if isinstance(content, list):
+            for item in content:
+                if isinstance(item, dict) and item.get('type') == 'text':
+                    content = item.get('text', '')
+                    break
+            else:
+                content = ''
+
+        if content and isinstance(content, str):
+            # 跳过系统/命令消息
+            if content.startswith(('<local-command', '<command-', '<task-notification')):
+                return None
+            if len(content) > 20:
+                return {
+                    'role': 'user',
+                    'content': content,
+                    'line': line_num,
+                    'session': session_file.stem[:8]
+                }
+
+    elif msg_type == 'assistant':
+        msg_content = msg.get('message', {}).get('content', '')
+        text_content = ''
+        tool_uses = []
+
+        if isinstance(msg_content, str):
+            text_content = msg_content
+        elif isinstance(msg_content, list):
+            for item in msg_content:
+                if item.get('type') == 'text':
+                    text_content = item.get('text', '')
+                elif item.get('type') == 'tool_use':
+                    tool_name = item.get('name', '')
+                    tool_input = item.get('input', {})
+                    if tool_name == 'Edit':
+                        tool_uses.append(f"Edit: {tool_input.get('file_path', 'unknown')}")
+                    elif tool_name == 'Write':
+                        tool_uses.append(f"Write: {tool_input.get('file_path', 'unknown')}")
+                    elif tool_name == 'Bash':
+                        cmd = tool_input.get('command', '')[:80]
+                        tool_uses.append(f"Bash: {cmd}")
+                    elif tool_name == 'AskUserQuestion':
+                        tool_uses.append("AskUserQuestion")
+                    else:
+                        tool_uses.append(f"{tool_name}")
+
+        if text_content or tool_uses:
+            return {
+                'role': 'assistant',
+                'content': text_content[:600] if text_content else '',
+                'tools': tool_uses,
+                'line': line_num,
+                'session': session_file.stem[:8]
+            }
+
+    return None
 
 
-def extract_messages_from_session(session_file: Path, after_line: int = -1) -> List[Dict]:
+def scan_and_extract(session_file: Path) -> Tuple[int, Optional[str], List[Dict]]:
     """
-    从会话文件中提取对话消息。
-    如果 after_line >= 0，只提取该行之后的消息。
-    如果 after_line < 0，提取所有消息。
+    单次扫描会话文件：同时定位最后一次 planning 更新并提取其后的消息。
+    返回 (更新行号, 文件名, 更新之后的消息)；
+    未找到更新时返回 (-1, None, 全部消息)。
     """
-    result = []
+    update_line = -1
+    update_file = None
+    messages: List[Dict] = []
 
     try:
-        with open(session_file, 'r') as f:
+        with open(session_file, 'rb') as f:
             for line_num, line in enumerate(f):
-                if after_line >= 0 and line_num <= after_line:
-                    continue
-
                 try:
-                    msg = json.loads(line)
-                except json.JSONDecodeError:
+                    msg = _json_loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(msg, dict):
                     continue
 
-                msg_type = msg.get('type')
-                is_meta = msg.get('isMeta', False)
-
-                if msg_type == 'user' and not is_meta:
-                    content = msg.get('message', {}).get('content', '')
-                    if isinstance(content, list):
-                        for item in content:
-                            if isinstance(item, dict) and item.get('type') == 'text':
-                                content = item.get('text', '')
-                                break
-                        else:
-                            content = ''
-
-                    if content and isinstance(content, str):
-                        # 跳过系统/命令消息
-                        if content.startswith(('<local-command', '<command-', '<task-notification')):
-                            continue
-                        if len(content) > 20:
-                            result.append({
-                                'role': 'user',
-                                'content': content,
-                                'line': line_num,
-                                'session': session_file.stem[:8]
-                            })
-
-                elif msg_type == 'assistant':
-                    msg_content = msg.get('message', {}).get('content', '')
-                    text_content = ''
-                    tool_uses = []
-
-                    if isinstance(msg_content, str):
-                        text_content = msg_content
-                    elif isinstance(msg_content, list):
-                        for item in msg_content:
-                            if item.get('type') == 'text':
-                                text_content = item.get('text', '')
-                            elif item.get('type') == 'tool_use':
-                                tool_name = item.get('name', '')
-                                tool_input = item.get('input', {})
-                                if tool_name == 'Edit':
-                                    tool_uses.append(f"Edit: {tool_input.get('file_path', 'unknown')}")
-                                elif tool_name == 'Write':
-                                    tool_uses.append(f"Write: {tool_input.get('file_path', 'unknown')}")
-                                elif tool_name == 'Bash':
-                                    cmd = tool_input.get('command', '')[:80]
-                                    tool_uses.append(f"Bash: {cmd}")
-                                elif tool_name == 'AskUserQuestion':
-                                    tool_uses.append("AskUserQuestion")
-                                else:
-                                    tool_uses.append(f"{tool_name}")
-
-                    if text_content or tool_uses:
-                        result.append({
-                            'role': 'assistant',
-                            'content': text_content[:600] if text_content else '',
-                            'tools': tool_uses,
-                            'line': line_num,
-                            'session': session_file.stem[:8]
-                        })
+                if _is_planning_candidate(line):
+                    found = _planning_update_file(msg)
+                    if found:
+                        # 新的更新点：之前缓冲的消息都已同步到 planning 文件
+                        update_line = line_num
+                        update_file = found
+                        messages = []
+                        continue
+
+                message = _parse_message(msg, line_num, session_file)
+                if message:
+                    messages.append(message)
     except Exception:
         pass
 
-    return result
+    return update_line, update_file, messages
 
 
 def main():
@@ -215,19 +243,27 @@ def main():
     previous_sessions = sessions[1:]
 
     # 在所有之前的会话中找到最近的 planning 文件更新
+    # 字节预过滤排除的会话先不解析，找到更新点后才提取其消息；
+    # 通过预过滤的会话只扫描一次，同时拿到更新点之后的消息
     update_session = None
-    update_line = -1
     update_file = None
     update_session_idx = -1
+    messages_from_update_session: List[Dict] = []
+    # 更新会话之后的会话（新 → 旧）；消息为 None 表示尚未解析
+    intermediate: List[Tuple[Path, Optional[List[Dict]]]] = []
 
     for idx, session in enumerate(previous_sessions):
-        line, filename = scan_for_planning_update(session)
+        if not _may_have_planning_update(session):
+            intermediate.append((session, None))
+            continue
+        line, filename, messages = scan_and_extract(session)
         if line >= 0:
             update_session = session
-            update_line = line
             update_file = filename
             update_session_idx = idx
+            messages_from_update_session = messages
             break
+        intermediate.append((session, messages))
 
     if not update_session:
         print("在之前的会话中未找到 planning 文件更新")
@@ -236,16 +272,13 @@ def main():
     # 收集从更新点开始的所有消息
     all_messages = []
 
-    # 1. 获取包含更新的会话中的消息（在更新行之后）
-    messages_from_update_session = extract_messages_from_session(update_session, after_line=update_line)
+    # 1. 包含更新的会话中（更新行之后）的消息
     all_messages.extend(messages_from_update_session)
 
-    # 2. 获取更新会话到当前会话之间的所有消息
-    intermediate_sessions = previous_sessions[:update_session_idx]
-
-    # 按时间顺序处理（从旧到新）
-    for session in reversed(intermediate_sessions):
-        messages = extract_messages_from_session(session, after_line=-1)
+    # 2. 更新会话到当前会话之间的所有消息，按时间顺序（从旧到新）
+    for session, messages in reversed(intermediate):
+        if messages is None:
+            messages = scan_and_extract(session)[2]
         all_messages.extend(messages)
 
     if not all_messages:
@@ -2,9 +2,9 @@
 """
 AppleScript-based message sender for Codex Desktop.
 
-Uses osascript + System Events to:
-1. Activate Codex
-2. Set clipboard
+Uses a single osascript + System Events invocation to:
+1. Set clipboard
+2. Activate Codex
 3. Paste (Cmd+V) via System Events keystroke
 4. Press Enter via System Events keystroke
 
@@ -12,21 +12,105 @@ This avoids CGEvent (which may hit wrong window) and instead
 uses System Events keystroke targeting the Codex process directly.
 """
 
+import ctypes
+import ctypes.util
 import logging
 import subprocess
 import time
-from typing import Optional
+from typing import Any, Dict, Optional
+
+try:
+    from AppKit import (
+        NSApplicationActivateIgnoringOtherApps,
+        NSPasteboard,
+        NSPasteboardTypeString,
+        NSRunningApplication,
+    )
+    from Foundation import NSDate, NSRunLoop
+except ImportError:  # pyobjc is optional; fall back to osascript / pbcopy
+    NSPasteboard = NSRunningApplication = None
 
 logger = logging.getLogger(__name__)
 
+CODEX_BUNDLE_ID = "com.openai.codex"
+
+# CoreGraphics/CoreFoundation bindings for the CGEvent fallback, see _cg_bindings()
+_CG: Optional[Dict[str, Any]] = None
+
+
+# Texts up to this size are passed to osascript as an argument; larger ones
+# are put on the clipboard beforehand to stay well clear of ARG_MAX.
+INLINE_CLIPBOARD_MAX = 100 * 1024
+
+# Clipboard + activate + paste + Enter in a single osascript process.
+# Instead of fixed delays, poll until Codex is frontmost (max ~2s).
+_SEND_SCRIPT = """
+on run argv
+    if (count of argv) > 0 then set the clipboard to item 1 of argv
+    tell application "Codex" to activate
+    tell application "System Events"
+        tell process "Codex"
+            set frontmost to true
+            repeat 40 times
+                if frontmost is true then exit repeat
+                delay 0.05
+            end repeat
+            keystroke "v" using {command down}
+            keystroke return
+        end tell
+    end tell
+end run
+"""
+
+
+# Activate only, for the CGEvent fallback.
+_ACTIVATE_SCRIPT = """
+tell application "Codex"
+    activate
+    repeat 40 times
+        if frontmost is true then exit repeat
+        delay 0.05
+    end repeat
+end tell
+"""
+
+
+def _set_clipboard(text: str) -> bool:
+    """
+    Set the clipboard for oversized texts: in-process via NSPasteboard when
+    pyobjc is available, otherwise through a pbcopy subprocess.
+    """
+    if NSPasteboard is not None:
+        pb = NSPasteboard.generalPasteboard()
+        pb.clearContents()
+        if pb.setString_forType_(text, NSPasteboardTypeString):
+            return True
+        logger.warning("AppleScript sender: NSPasteboard write failed, using pbcopy")
+    return _pbcopy(text)
+
+
+def _pbcopy(text: str) -> bool:
+    """Set the clipboard via pbcopy."""
+    try:
+        proc = subprocess.Popen(['pbcopy'], stdin=subprocess.PIPE, text=True)
+        proc.communicate(input=text, timeout=5)
+        if proc.returncode != 0:
+            logger.error("AppleScript sender: pbcopy failed")
+            return False
+    except Exception as e:
+        logger.error(f"AppleScript sender: pbcopy error: {e}")
+        return False
+    return True
+
 
 def send_via_applescript(text: str, project_name: str = "Codex") -> bool:
     """
     Send text to Codex Desktop via AppleScript System Events.
     
-    Steps:
-    1. Set clipboard via pbcopy
-    2. Activate Codex
+    One osascript process:
+    1. Set clipboard (text passed as argv; very large texts are put on the
+       clipboard beforehand)
+    2. Activate Codex and wait until it is frontmost
     3. Paste via System Events keystroke "v" using {command down}
     4. Press Enter via System Events keystroke return
     
@@ -39,37 +123,14 @@ def send_via_applescript(text: str, project_name: str = "Codex") -> bool:
     """
     logger.info(f"AppleScript sender: sending {len(text)} chars to {project_name}")
     
-    # 1. Set clipboard
-    try:
-        proc = subprocess.Popen(['pbcopy'], stdin=subprocess.PIPE, text=True)
-        proc.communicate(input=text, timeout=5)
-        if proc.returncode != 0:
-            logger.error("AppleScript sender: pbcopy failed")
-            return False
-    except Exception as e:
-        logger.error(f"AppleScript sender: pbcopy error: {e}")
+    args = ['osascript', '-e', _SEND_SCRIPT]
+    if len(text.encode('utf-8')) <= INLINE_CLIPBOARD_MAX:
+        args.append(text)
+    elif not _set_clipboard(text):
         return False
     
-    # 2. Activate + Paste + Enter via single osascript
-    script = '''
-    tell application "Codex" to activate
-    delay 1
-    tell application "System Events"
-        tell process "Codex"
-            set frontmost to true
-            delay 0.3
-            keystroke "v" using {command down}
-            delay 0.5
-            keystroke return
-        end tell
-    end tell
-    '''
-    
     try:
-        result = subprocess.run(
-            ['osascript', '-e', script],
-            capture_output=True, text=True, timeout=15
-        )
+        result = subprocess.run(args, capture_output=True, text=True, timeout=15)
         if result.returncode == 0:
             logger.info("AppleScript sender: sent successfully")
             return True
@@ -89,60 +150,103 @@ def send_via_applescript(text: str, project_name: str = "Codex") -> bool:
         return False
 
 
-def _send_via_cgevent(text: str, project_name: str) -> bool:
+def _activate_codex() -> None:
     """
-    Fallback: activate via osascript, then paste+enter via CGEvent.
+    Bring Codex to the front before posting CGEvents.
+
+    With pyobjc available this activates in-process and spins the run loop
+    until the app reports itself active; otherwise it runs the osascript
+    activate + frontmost poll.
     """
-    import ctypes
-    import ctypes.util
-    
-    # Activate
+    if NSRunningApplication is not None:
+        apps = NSRunningApplication.runningApplicationsWithBundleIdentifier_(CODEX_BUNDLE_ID)
+        if apps:
+            app = apps[0]
+            app.activateWithOptions_(NSApplicationActivateIgnoringOtherApps)
+            run_loop = NSRunLoop.currentRunLoop()
+            for _ in range(40):
+                if app.isActive():
+                    return
+                run_loop.runUntilDate_(NSDate.dateWithTimeIntervalSinceNow_(0.05))
+            return
     try:
         subprocess.run(
-            ['osascript', '-e', 'tell application "Codex" to activate'],
+            ['osascript', '-e', _ACTIVATE_SCRIPT],
             capture_output=True, timeout=5
         )
-        time.sleep(1.0)
     except Exception:
         pass
+
+
+def _cg_bindings() -> Optional[Dict[str, Any]]:
+    """
+    Load CoreGraphics/CoreFoundation once and return the prototyped functions
+    plus a shared event source. Returns None if no source could be created.
+    """
+    global _CG
+    if _CG is not None:
+        return _CG
+
+    cg_path = ctypes.util.find_library('CoreGraphics')
+    cg = ctypes.cdll.LoadLibrary(
+        cg_path or '/System/Library/Frameworks/CoreGraphics.framework/CoreGraphics'
+    )
+    cf = ctypes.cdll.LoadLibrary(
+        '/System/Library/Frameworks/CoreFoundation.framework/CoreFoundation'
+    )
+
+    cg.CGEventSourceCreate.restype = ctypes.c_void_p
+    cg.CGEventSourceCreate.argtypes = [ctypes.c_int]
+    cg.CGEventCreateKeyboardEvent.restype = ctypes.c_void_p
+    cg.CGEventCreateKeyboardEvent.argtypes = [
+        ctypes.c_void_p, ctypes.c_uint16, ctypes.c_bool
+    ]
+    cg.CGEventSetFlags.argtypes = [ctypes.c_void_p, ctypes.c_uint64]
+    cg.CGEventPost.argtypes = [ctypes.c_int, ctypes.c_void_p]
+    cf.CFRelease.argtypes = [ctypes.c_void_p]
+
+    source = cg.CGEventSourceCreate(0)
+    if not source:
+        return None
+
+    _CG = {
+        'source': source,
+        'post': cg.CGEventPost,
+        'create_kev': cg.CGEventCreateKeyboardEvent,
+        'set_flags': cg.CGEventSetFlags,
+        'release': cf.CFRelease,
+    }
+    return _CG
+
+
+def _send_via_cgevent(text: str, project_name: str) -> bool:
+    """
+    Fallback: activate Codex, then paste+enter via CGEvent.
+    """
+    _activate_codex()
     
     # Clipboard already set from caller
     
     try:
-        cg_path = ctypes.util.find_library('CoreGraphics')
-        cg = ctypes.cdll.LoadLibrary(
-            cg_path or '/System/Library/Frameworks/CoreGraphics.framework/CoreGraphics'
-        )
-        cf = ctypes.cdll.LoadLibrary(
-            '/System/Library/Frameworks/CoreFoundation.framework/CoreFoundation'
-        )
-        
-        cg.CGEventSourceCreate.restype = ctypes.c_void_p
-        cg.CGEventSourceCreate.argtypes = [ctypes.c_int]
-        source = cg.CGEventSourceCreate(0)
-        if not source:
+        cgb = _cg_bindings()
+        if cgb is None:
             logger.error("CGEvent: cannot create source")
             return False
-        
-        cg.CGEventCreateKeyboardEvent.restype = ctypes.c_void_p
-        cg.CGEventCreateKeyboardEvent.argtypes = [
-            ctypes.c_void_p, ctypes.c_uint16, ctypes.c_bool
-        ]
-        cg.CGEventSetFlags.argtypes = [ctypes.c_void_p, ctypes.c_uint64]
-        cg.CGEventPost.argtypes = [ctypes.c_int, ctypes.c_void_p]
-        cf.CFRelease.argtypes = [ctypes.c_void_p]
+        source = cgb['source']
+        post, create_kev = cgb['post'], cgb['create_kev']
+        set_flags, release = cgb['set_flags'], cgb['release']
         
         def _key(code, cmd=False):
-            down = cg.CGEventCreateKeyboardEvent(source, code, True)
-            up = cg.CGEventCreateKeyboardEvent(source, code, False)
+            down = create_kev(source, code, True)
+            up = create_kev(source, code, False)
             if cmd:
-                cg.CGEventSetFlags(down, 0x100000)
-                cg.CGEventSetFlags(up, 0x100000)
-            cg.CGEventPost(0, down)
+                set_flags(down, 0x100000)
+                set_flags(up, 0x100000)
+            post(0, down)
             time.sleep(0.05)
-            cg.CGEventPost(0, up)
-            cf.CFRelease(down)
-            cf.CFRelease(up)
+            post(0, up)
+            release(down)
+            release(up)
         
         # Cmd+V
         _key(9, cmd=True)
@@ -150,7 +254,6 @@ def _send_via_cgevent(text: str, project_name: str) -> bool:
         # Enter
         _key(36)
         
-        cf.CFRelease(source)
         logger.info("AppleScript sender (CGEvent fallback): sent")
         return True
         
@@ -5,18 +5,52 @@ Layer 3: Done Checker
 - 支持三种条件类型: files, files_glob, commands
 """
 
+import fnmatch
+import functools
 import glob as glob_module
 import logging
+import mmap
 import os
+import re
+import select
+import shlex
+import signal
+import stat
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, AnyStr, Callable, Dict, Iterator, List, Optional
 
 logger = logging.getLogger(__name__)
 
 # 命令执行超时（秒）
 COMMAND_TIMEOUT = 60
 
+# 出现这些字符时需要 shell 解析（管道、重定向、变量、通配、注释、~ 展开等）
+_SHELL_META_CHARS = frozenset('|&;<>()$`*?[]{}~#!\\\n')
+
+# contains 检查：小于该大小的文件一次读入，否则 mmap
+CONTAINS_MMAP_MIN_SIZE = 64 * 1024
+# contains 检查的分块读取大小（mmap 不可用时）
+CONTAINS_CHUNK_SIZE = 1024 * 1024
+
+# 并发执行检查的线程数（进程内共享一个线程池）
+CHECK_WORKERS = 8
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=CHECK_WORKERS, thread_name_prefix="done-check"
+            )
+        return _executor
+
 
 @dataclass
 class CheckResult:
@@ -39,6 +73,70 @@ class DoneResult:
         return [r for r in self.results if not r.passed]
 
 
+def _scan_chunks(f, remaining: Dict[str, bytes]) -> None:
+    """分块读取，块之间保留 (最长关键词 - 1) 字节重叠；找到的关键词从 remaining 删除"""
+    overlap = max(len(b) for b in remaining.values()) - 1
+    tail = b''
+    while remaining:
+        chunk = f.read(CONTAINS_CHUNK_SIZE)
+        if not chunk:
+            break
+        window = tail + chunk
+        for kw in [kw for kw, kwb in remaining.items() if kwb in window]:
+            del remaining[kw]
+        tail = window[-overlap:] if overlap > 0 else b''
+
+
+def _scan_mmap(mm: mmap.mmap, remaining: Dict[str, bytes]) -> None:
+    """
+    单遍窗口扫描 mmap：每个窗口趁还在缓存里查完所有剩余关键词，全部找到即停
+
+    相邻窗口重叠 (最长关键词 - 1) 字节；缺失的关键词不再各自把整个文件扫一遍
+    """
+    overlap = max(len(b) for b in remaining.values()) - 1
+    size = len(mm)
+    start = 0
+    while remaining and start < size:
+        end = min(start + CONTAINS_CHUNK_SIZE + overlap, size)
+        for kw in [kw for kw, kwb in remaining.items() if mm.find(kwb, start, end) != -1]:
+            del remaining[kw]
+        start += CONTAINS_CHUNK_SIZE
+
+
+def _find_missing_keywords(path: str, keywords: List[str], file_size: int) -> List[str]:
+    """
+    返回文件中未出现的关键词（保持原顺序），按字节匹配 UTF-8 编码的关键词
+    
+    - 关键词比文件还长：必然缺失，不读文件直接返回
+    - 小文件：一次读入
+    - 大文件：mmap 后单遍窗口扫描，全部找到即停；mmap 不可用时分块流式扫描
+    """
+    # 空关键词总是视为存在
+    remaining = {kw: kw.encode('utf-8') for kw in keywords if kw}
+    if not remaining:
+        return []
+    
+    impossible = [kw for kw, kwb in remaining.items() if len(kwb) > file_size]
+    if impossible:
+        return impossible
+    
+    with open(path, 'rb') as f:
+        if file_size < CONTAINS_MMAP_MIN_SIZE:
+            data = f.read()
+            for kw in [kw for kw, kwb in remaining.items() if kwb in data]:
+                del remaining[kw]
+        else:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                _scan_chunks(f, remaining)
+            else:
+                with mm:
+                    _scan_mmap(mm, remaining)
+    
+    return [kw for kw in keywords if kw in remaining]
+
+
 def check_file_condition(
     file_spec: Dict[str, Any],
     project_dir: str,
@@ -60,18 +158,16 @@ def check_file_condition(
     min_size = file_spec.get("min_size", default_min_size)
     contains = file_spec.get("contains", [])
     
-    # 检查文件是否存在
-    if not os.path.exists(full_path):
+    # 一次 stat 同时得到存在性、类型和大小
+    try:
+        st = os.stat(full_path)
+    except FileNotFoundError:
         return CheckResult(
             check_type="file",
             description=f"文件: {rel_path}",
             passed=False,
             details=f"文件不存在"
         )
-    
-    # 检查文件大小
-    try:
-        file_size = os.path.getsize(full_path)
     except OSError as e:
         return CheckResult(
             check_type="file",
@@ -80,6 +176,16 @@ def check_file_condition(
             details=f"无法读取文件大小: {e}"
         )
     
+    if not stat.S_ISREG(st.st_mode):
+        return CheckResult(
+            check_type="file",
+            description=f"文件: {rel_path}",
+            passed=False,
+            details=f"不是普通文件"
+        )
+    
+    file_size = st.st_size
+    
     if file_size < min_size:
         return CheckResult(
             check_type="file",
@@ -91,10 +197,7 @@ def check_file_condition(
     # 检查文件内容（如果指定了 contains）
     if contains:
         try:
-            with open(full_path, 'r', encoding='utf-8', errors='replace') as f:
-                content = f.read()
-            
-            missing_keywords = [kw for kw in contains if kw not in content]
+            missing_keywords = _find_missing_keywords(full_path, contains, file_size)
             if missing_keywords:
                 return CheckResult(
                     check_type="file",
@@ -118,6 +221,108 @@ def check_file_condition(
     )
 
 
+@functools.lru_cache(maxsize=256)
+def _segment_matcher(segment: AnyStr) -> Callable[[AnyStr], Optional[re.Match]]:
+    """单级路径通配符（str，或只含 * 的 ASCII bytes）→ 预编译的匹配函数"""
+    if isinstance(segment, bytes):
+        return re.compile(fnmatch.translate(segment.decode('ascii')).encode('ascii')).match
+    return re.compile(fnmatch.translate(segment)).match
+
+
+def _iter_glob_files(full_pattern: str) -> Iterator[os.stat_result]:
+    """
+    按 glob 语义（含 ** 递归）逐级 scandir，产出匹配的普通文件 stat
+    
+    与 glob.glob(recursive=True) 一致：通配符不匹配隐藏文件（模式以 . 开头除外）。
+    不同之处：** 不进入指向目录的符号链接，避免环路。
+    剩余各段为 ASCII 且只用 * 通配时以 bytes 路径遍历，目录项名无需解码成 str
+    （? 与 [...] 按字节匹配会把多字节字符拆开，这类模式仍用 str）。
+    """
+    parts = full_pattern.split(os.sep)
+    first_magic = next(
+        (i for i, part in enumerate(parts) if glob_module.has_magic(part)), None
+    )
+    if first_magic is None:
+        # 无通配符：直接 stat
+        try:
+            st = os.stat(full_pattern)
+        except OSError:
+            return
+        if stat.S_ISREG(st.st_mode):
+            yield st
+        return
+    
+    base = os.sep.join(parts[:first_magic]) or os.sep
+    rest = parts[first_magic:]
+    if all(part.isascii() and '?' not in part and '[' not in part for part in rest):
+        yield from _walk_glob(os.fsencode(base), [os.fsencode(part) for part in rest])
+    else:
+        yield from _walk_glob(base, rest)
+
+
+def _walk_glob(dir_path: AnyStr, parts: List[AnyStr]) -> Iterator[os.stat_result]:
+    segment, rest = parts[0], parts[1:]
+    if isinstance(segment, bytes):
+        dot, recursive = b'.', b'**'
+    else:
+        dot, recursive = '.', '**'
+    
+    if not glob_module.has_magic(segment):
+        path = os.path.join(dir_path, segment)
+        if rest:
+            yield from _walk_glob(path, rest)
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        if stat.S_ISREG(st.st_mode):
+            yield st
+        return
+    
+    if segment == recursive:
+        # 匹配零层目录
+        if rest:
+            yield from _walk_glob(dir_path, rest)
+        try:
+            with os.scandir(dir_path) as it:
+                entries = list(it)
+        except OSError:
+            return
+        for entry in entries:
+            if entry.name.startswith(dot):
+                continue
+            try:
+                if not rest and entry.is_file():
+                    yield entry.stat()
+                if entry.is_dir(follow_symlinks=False):
+                    yield from _walk_glob(entry.path, parts)
+            except OSError:
+                continue
+        return
+    
+    match = _segment_matcher(segment)
+    include_hidden = segment.startswith(dot)
+    try:
+        with os.scandir(dir_path) as it:
+            entries = list(it)
+    except OSError:
+        return
+    for entry in entries:
+        if entry.name.startswith(dot) and not include_hidden:
+            continue
+        if not match(entry.name):
+            continue
+        try:
+            if rest:
+                if entry.is_dir():
+                    yield from _walk_glob(entry.path, rest)
+            elif entry.is_file():
+                yield entry.stat()
+        except OSError:
+            continue
+
+
 def check_glob_condition(
     glob_spec: Dict[str, Any],
     project_dir: str,
@@ -141,38 +346,171 @@ def check_glob_condition(
     # 构建完整的 glob 路径
     full_pattern = os.path.join(project_dir, pattern)
     
-    # 查找匹配文件
-    matches = glob_module.glob(full_pattern, recursive=True)
-    
-    # 过滤掉目录和小于 min_file_size 的文件
-    valid_files = []
-    for match in matches:
-        if os.path.isfile(match):
-            try:
-                if os.path.getsize(match) >= min_file_size:
-                    valid_files.append(match)
-            except OSError:
-                continue
+    # 逐级 scandir 查找匹配文件，过滤掉小于 min_file_size 的文件；
+    # 数量达到要求即停止遍历
+    valid_count = 0
+    for st in _iter_glob_files(full_pattern):
+        if st.st_size >= min_file_size:
+            valid_count += 1
+            if valid_count >= min_count:
+                break
     
-    if len(valid_files) < min_count:
+    if valid_count < min_count:
         return CheckResult(
             check_type="glob",
             description=f"Glob: {pattern}",
             passed=False,
-            details=f"找到 {len(valid_files)} 个文件 < 要求的 {min_count} 个"
+            details=f"找到 {valid_count} 个文件 < 要求的 {min_count} 个"
         )
     
     return CheckResult(
         check_type="glob",
         description=f"Glob: {pattern}",
         passed=True,
-        details=f"找到 {len(valid_files)} 个文件 >= {min_count}"
+        details=f"找到 {valid_count} 个文件 >= {min_count}"
+    )
+
+
+class PersistentShell:
+    """
+    常驻 /bin/sh 进程，依次执行同一项目的多条检查命令（与 shell=True 同一解释器）
+
+    命令经 stdin 写入，在子 shell ( ... ) 中 eval，cd/exit/变量赋值不影响后续命令；
+    命令以单引号字面量传给 eval，未闭合的引号、多余的 ) 等语法错误只让这一条
+    以退出码 2 失败，不会吞掉结束标记或破坏常驻 shell 的解析状态。
+    stdout/stderr 各以 NUL 包围的结束标记分隔，stdout 标记带退出码。
+    shell 因超时被杀或意外退出后，下一条命令自动重启。
+    省掉每条命令 fork+exec 一个新 shell 的开销，但命令共享同一进程环境，
+    因此仅在 done_when.persistent_shell 为 true 时启用。
+    """
+    
+    _EXIT_RE = re.compile(rb'\0EXIT:(\d+)\0$')
+    _ERR_MARK = b'\0EXIT\0'
+    
+    def __init__(self, project_dir: str, shell: str = '/bin/sh'):
+        self._project_dir = project_dir
+        self._shell = shell
+        self._proc: Optional[subprocess.Popen] = None
+        self._start()
+    
+    def _start(self) -> None:
+        self._proc = subprocess.Popen(
+            [self._shell, '-s'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=self._project_dir,
+            start_new_session=True,
+        )
+    
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+    
+    def run(self, cmd: str, timeout: float = COMMAND_TIMEOUT) -> subprocess.CompletedProcess:
+        """执行一条命令；超时时杀掉整个 shell 并抛出 TimeoutExpired"""
+        if not self.alive:
+            self.close()
+            self._start()
+        script = (
+            f"( eval {shlex.quote(cmd)} ) </dev/null; __ap_rc=$?; "
+            f"printf '\\0EXIT:%d\\0' \"$__ap_rc\"; printf '\\0EXIT\\0' >&2\n"
+        )
+        try:
+            self._proc.stdin.write(script.encode('utf-8'))
+            self._proc.stdin.flush()
+        except (OSError, ValueError):
+            self.close()
+            raise OSError("persistent shell 写入失败")
+        
+        out_fd = self._proc.stdout.fileno()
+        err_fd = self._proc.stderr.fileno()
+        out, err = b'', b''
+        out_match = None
+        err_done = False
+        deadline = time.monotonic() + timeout
+        while out_match is None or not err_done:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.close()
+                raise subprocess.TimeoutExpired(cmd, timeout)
+            fds = [fd for fd, done in ((out_fd, out_match), (err_fd, err_done)) if not done]
+            ready, _, _ = select.select(fds, [], [], remaining)
+            for fd in ready:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    self.close()
+                    raise OSError("persistent shell 意外退出")
+                if fd == out_fd:
+                    # 标记只可能出现在末尾，从新数据附近开始找
+                    out_match = self._EXIT_RE.search(out + chunk, max(0, len(out) - 32))
+                    out += chunk
+                else:
+                    err += chunk
+                    err_done = err.endswith(self._ERR_MARK)
+        
+        return subprocess.CompletedProcess(
+            cmd, int(out_match.group(1)),
+            stdout=out[:out_match.start()],
+            stderr=err[:-len(self._ERR_MARK)],
+        )
+    
+    def close(self) -> None:
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            # 连同仍在运行的子命令一起结束
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        for stream in (proc.stdin, proc.stdout, proc.stderr):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        proc.wait()
+
+
+def _run_check_command(cmd: str, project_dir: str) -> subprocess.CompletedProcess:
+    """
+    执行检查命令：简单命令直接 exec，省掉 /bin/sh 一层 fork
+    
+    含 shell 元字符、无法按 shell 规则切分，或 exec 失败
+    （exit/cd 等内建命令、VAR=x 前缀、无 shebang 脚本）时仍走 shell=True，语义不变。
+    """
+    args = None
+    if not any(c in _SHELL_META_CHARS for c in cmd):
+        try:
+            args = shlex.split(cmd)
+        except ValueError:
+            args = None
+    
+    if args:
+        try:
+            return subprocess.run(
+                args,
+                capture_output=True,
+                timeout=COMMAND_TIMEOUT,
+                cwd=project_dir
+            )
+        except OSError:
+            # 找不到/不可执行/无 shebang 的脚本：交给 shell 按原语义处理
+            pass
+    
+    return subprocess.run(
+        cmd,
+        shell=True,
+        capture_output=True,
+        timeout=COMMAND_TIMEOUT,
+        cwd=project_dir
     )
 
 
 def check_command_condition(
     cmd_spec: Dict[str, Any],
-    project_dir: str
+    project_dir: str,
+    shell: Optional[PersistentShell] = None
 ) -> CheckResult:
     """
     检查命令执行条件
@@ -180,6 +518,7 @@ def check_command_condition(
     Args:
         cmd_spec: 命令规格 {cmd, expect_exit?}
         project_dir: 项目目录
+        shell: 可选的常驻 shell；不可用时退回单独起进程
     
     Returns:
         CheckResult
@@ -194,13 +533,10 @@ def check_command_condition(
     short_cmd = cmd if len(cmd) <= 50 else cmd[:47] + "..."
     
     try:
-        result = subprocess.run(
-            cmd,
-            shell=True,
-            capture_output=True,
-            timeout=COMMAND_TIMEOUT,
-            cwd=project_dir
-        )
+        if shell is not None:
+            result = shell.run(cmd)
+        else:
+            result = _run_check_command(cmd, project_dir)
         
         if result.returncode == expect_exit:
             return CheckResult(
@@ -244,7 +580,7 @@ def check_done_conditions(
     检查任务完成条件
     
     Args:
-        done_when: 完成条件配置 {files?, files_glob?, commands?}
+        done_when: 完成条件配置 {files?, files_glob?, commands?, persistent_shell?}
         project_dir: 项目目录
         default_min_size: 默认最小文件大小
     
@@ -259,23 +595,52 @@ def check_done_conditions(
             summary="无完成条件"
         )
     
+    # 文件 / glob 检查彼此独立，逐项并发；命令之间可能有依赖（如先 build 再 test），
+    # 整体作为一个任务按顺序执行，与文件检查并发
+    def run_commands() -> List[CheckResult]:
+        shell = None
+        if done_when.get("persistent_shell"):
+            try:
+                shell = PersistentShell(project_dir)
+            except OSError as e:
+                logger.warning(f"persistent shell 启动失败，逐条执行: {e}")
+        try:
+            return [
+                check_command_condition(cmd_spec, project_dir, shell)
+                for cmd_spec in done_when.get("commands", [])
+            ]
+        finally:
+            if shell is not None:
+                shell.close()
+    
+    executor = _get_executor()
+    file_futures = [
+        executor.submit(check_file_condition, file_spec, project_dir, default_min_size)
+        for file_spec in done_when.get("files", [])
+    ]
+    glob_futures = [
+        executor.submit(check_glob_condition, glob_spec, project_dir, default_min_size)
+        for glob_spec in done_when.get("files_glob", [])
+    ]
+    command_future = executor.submit(run_commands) if done_when.get("commands") else None
+    
+    # 按 files → files_glob → commands 的顺序收集结果
     results: List[CheckResult] = []
     
     # 1. 检查指定文件
-    for file_spec in done_when.get("files", []):
-        result = check_file_condition(file_spec, project_dir, default_min_size)
+    for future in file_futures:
+        result = future.result()
         results.append(result)
         logger.debug(f"文件检查: {result.description} -> {result.passed}")
     
     # 2. 检查文件 glob
-    for glob_spec in done_when.get("files_glob", []):
-        result = check_glob_condition(glob_spec, project_dir, default_min_size)
+    for future in glob_futures:
+        result = future.result()
         results.append(result)
         logger.debug(f"Glob检查: {result.description} -> {result.passed}")
     
     # 3. 执行验证命令
-    for cmd_spec in done_when.get("commands", []):
-        result = check_command_condition(cmd_spec, project_dir)
+    for result in (command_future.result() if command_future else []):
         results.append(result)
         logger.debug(f"命令检查: {result.description} -> {result.passed}")
     
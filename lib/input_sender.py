@@ -3,18 +3,25 @@
 Layer 1: Input Sender — tmux + CLI 模式
 
 发送方式：
-  1. tmux send-keys: 向对应项目的 tmux pane 发送文本（TUI 可见）
+  1. tmux load-buffer + paste-buffer: 向对应项目的 tmux pane 粘贴文本（TUI 可见）
   2. codex exec resume: 后台非交互发送（fallback）
 
 验证方式：
   - 检查 session JSONL 文件大小变化
+
+tmux 命令优先走常驻的控制模式连接 (tmux -C)，避免每次 fork/exec；
+连接不可用时退回 subprocess。
 """
 
+import functools
 import logging
 import os
+import select
 import subprocess
+import threading
 import time
-from typing import Optional
+import uuid
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -40,20 +47,286 @@ def _get_tmux_path(config: Optional[dict] = None) -> str:
     return TMUX_PATH
 
 
+# 不需要引号的 tmux 参数字符
+_TMUX_BARE_CHARS = frozenset(
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_./:=@%+,"
+)
+
+
+def _quote_tmux_arg(arg: str) -> Optional[str]:
+    """把参数转成 tmux 命令行语法，无法安全表示时返回 None"""
+    if arg and all(c in _TMUX_BARE_CHARS for c in arg):
+        return arg
+    # 单引号内不做任何展开（# 注释、$ 变量、~ 均按字面），但不能再含单引号
+    if "'" in arg or '\n' in arg or '\r' in arg:
+        return None
+    return f"'{arg}'"
+
+
+class PersistentTmuxClient:
+    """
+    tmux 控制模式常驻连接
+    
+    一个 `tmux -C attach-session` 进程承载所有命令：命令写入 stdin，
+    输出按 %begin/%end (%error) 分块读回。命令串行执行（加锁）。
+    任何读写异常或超时都会关闭连接，调用方退回 subprocess。
+    """
+    
+    def __init__(self, tmux: str, session: str = TMUX_SESSION):
+        self._tmux = tmux
+        self._session = session
+        self._proc: Optional[subprocess.Popen] = None
+        self._buf = b''
+        self._lock = threading.Lock()
+    
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+    
+    def start(self, timeout: float = 5) -> bool:
+        """启动控制模式连接，成功返回 True"""
+        try:
+            self._proc = subprocess.Popen(
+                [self._tmux, '-C', 'attach-session', '-t', self._session],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            logger.debug(f"tmux 控制模式启动失败: {e}")
+            self._proc = None
+            return False
+        
+        with self._lock:
+            deadline = time.monotonic() + timeout
+            # attach 完成的标志是 %session-changed 通知，在此之前
+            # refresh-client 会报 "no current client"
+            while True:
+                line = self._readline(deadline)
+                if line is None or line.startswith(b'%exit'):
+                    self._close_locked()
+                    return False
+                if line.startswith(b'%session-changed'):
+                    break
+            # 不接收 pane 输出通知（%output），否则 TUI 重绘会灌满管道
+            # 旧版 tmux 不支持 -f 会返回 %error，不影响后续命令
+            if self._send_line('refresh-client -f no-output') is None:
+                return False
+            # 同步：丢弃 sync 标记之前的所有输出块，之后命令与输出块一一对应
+            token = f"ap-sync-{uuid.uuid4().hex[:8]}"
+            if self._send_line(f"display-message -p {token}") is None:
+                return False
+            while True:
+                block = self._read_block(deadline)
+                if block is None:
+                    self._close_locked()
+                    return False
+                if token in block[1]:
+                    return True
+    
+    def cmd(self, args: List[str], timeout: float = 5) -> Optional[Tuple[bool, List[str]]]:
+        """
+        执行一条 tmux 命令
+        
+        Returns:
+            (是否成功, 输出行列表)；连接不可用或参数无法表示时返回 None
+        """
+        return self.cmd_list([args], timeout)
+    
+    def cmd_list(self, commands: List[List[str]],
+                 timeout: float = 5) -> Optional[Tuple[bool, List[str]]]:
+        """
+        在一行内执行多条 tmux 命令（以 ; 连接），只需一次往返
+        
+        Returns:
+            (是否全部成功, 合并的输出行列表)；连接不可用或参数无法表示时返回 None
+        """
+        quoted_cmds = []
+        for args in commands:
+            quoted = [_quote_tmux_arg(a) for a in args]
+            if any(q is None for q in quoted):
+                return None
+            quoted_cmds.append(' '.join(quoted))
+        
+        with self._lock:
+            if not self.alive:
+                return None
+            if self._send_line(' ; '.join(quoted_cmds)) is None:
+                return None
+            deadline = time.monotonic() + timeout
+            lines: List[str] = []
+            # 每条命令各回一个输出块；某条失败时 tmux 跳过同一行的其余命令
+            for _ in quoted_cmds:
+                block = self._read_block(deadline)
+                if block is None:
+                    # 超时后输出流已错位，整个连接作废
+                    self._close_locked()
+                    return None
+                lines.extend(block[1])
+                if not block[0]:
+                    return False, lines
+            return True, lines
+    
+    def close(self) -> None:
+        with self._lock:
+            self._close_locked()
+    
+    def _send_line(self, line: str) -> Optional[bool]:
+        try:
+            self._proc.stdin.write(line.encode('utf-8') + b'\n')
+            self._proc.stdin.flush()
+            return True
+        except (OSError, ValueError, AttributeError):
+            self._close_locked()
+            return None
+    
+    def _readline(self, deadline: float) -> Optional[bytes]:
+        """读取一行原始字节（%output 等通知行无需解码，直接跳过）"""
+        fd = self._proc.stdout.fileno()
+        while b'\n' not in self._buf:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                return None
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return None
+            self._buf += chunk
+        line, self._buf = self._buf.split(b'\n', 1)
+        return line.rstrip(b'\r')
+    
+    def _read_block(self, deadline: float) -> Optional[Tuple[bool, List[str]]]:
+        """读取下一个 %begin ... %end/%error 输出块，跳过块外的通知行"""
+        in_block = False
+        lines: List[str] = []
+        while True:
+            line = self._readline(deadline)
+            if line is None:
+                return None
+            if not in_block:
+                if line.startswith(b'%begin'):
+                    in_block = True
+                elif line.startswith(b'%exit'):
+                    return None
+                continue
+            if line.startswith(b'%end'):
+                return True, lines
+            if line.startswith(b'%error'):
+                return False, lines
+            lines.append(line.decode('utf-8', errors='replace'))
+    
+    def _close_locked(self) -> None:
+        proc, self._proc = self._proc, None
+        self._buf = b''
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=2)
+        except Exception:
+            proc.kill()
+
+
+# 全局控制模式连接（main 启动时打开，退出时关闭）
+_tmux_client: Optional[PersistentTmuxClient] = None
+
+
+def open_tmux_client(config: Optional[dict] = None) -> bool:
+    """打开常驻 tmux 控制模式连接（已连接则复用），失败时后续命令自动走 subprocess"""
+    global _tmux_client
+    if _tmux_client is not None and _tmux_client.alive:
+        return True
+    close_tmux_client()
+    client = PersistentTmuxClient(_get_tmux_path(config))
+    if client.start():
+        _tmux_client = client
+        logger.info("tmux 控制模式连接已建立")
+        return True
+    logger.info("tmux 控制模式不可用，使用 subprocess")
+    return False
+
+
+def close_tmux_client() -> None:
+    """关闭常驻 tmux 控制模式连接"""
+    global _tmux_client
+    if _tmux_client is not None:
+        _tmux_client.close()
+        _tmux_client = None
+
+
+def _run_tmux(args: List[str], config: Optional[dict] = None,
+              timeout: float = 5) -> subprocess.CompletedProcess:
+    """
+    执行 tmux 命令：优先常驻连接，否则 subprocess
+    
+    args 中单独的 ';' 与 tmux 命令行一样分隔多条命令，一次执行完。
+    返回 CompletedProcess（stdout/stderr 为 str），subprocess 超时照常抛出
+    """
+    if _tmux_client is not None:
+        commands: List[List[str]] = [[]]
+        for arg in args:
+            if arg == ';':
+                commands.append([])
+            else:
+                commands[-1].append(arg)
+        reply = _tmux_client.cmd_list(commands, timeout)
+        if reply is not None:
+            ok, lines = reply
+            output = '\n'.join(lines) + '\n' if lines else ''
+            return subprocess.CompletedProcess(
+                args, 0 if ok else 1,
+                stdout=output if ok else '', stderr='' if ok else output,
+            )
+    
+    return subprocess.run(
+        [_get_tmux_path(config)] + args,
+        capture_output=True, text=True, timeout=timeout
+    )
+
+
+# 近乎静态的探测结果缓存 TTL（秒）
+PROBE_CACHE_TTL = 3.0
+
+
+def _ttl_cache(ttl: float, key: Callable[[Optional[dict]], str]):
+    """
+    按 key(config) 缓存 fn(config) 的结果 ttl 秒；fn.cache_clear() 清空
+
+    key 取探测实际依赖的配置值（如可执行文件路径），不用 id(config)：
+    config 被回收后 id 可能被新对象复用，错误命中旧结果。
+    """
+    def decorator(fn):
+        cache: Dict[str, Tuple[float, Any]] = {}
+        
+        @functools.wraps(fn)
+        def wrapper(config: Optional[dict] = None):
+            cache_key = key(config)
+            now = time.monotonic()
+            hit = cache.get(cache_key)
+            if hit is not None and now - hit[0] < ttl:
+                return hit[1]
+            value = fn(config)
+            cache[cache_key] = (now, value)
+            return value
+        
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
+
+
+@_ttl_cache(PROBE_CACHE_TTL, key=_get_codex_path)
 def check_codex_cli(config: Optional[dict] = None) -> bool:
     """检查 codex CLI 是否可用"""
     codex = _get_codex_path(config)
     return os.path.isfile(codex) and os.access(codex, os.X_OK)
 
 
+@_ttl_cache(PROBE_CACHE_TTL, key=_get_tmux_path)
 def check_tmux_session(config: Optional[dict] = None) -> bool:
     """检查 autopilot tmux session 是否存在"""
-    tmux = _get_tmux_path(config)
     try:
-        result = subprocess.run(
-            [tmux, 'has-session', '-t', TMUX_SESSION],
-            capture_output=True, timeout=5
-        )
+        result = _run_tmux(['has-session', '-t', TMUX_SESSION], config)
         return result.returncode == 0
     except Exception:
         return False
@@ -61,11 +334,9 @@ def check_tmux_session(config: Optional[dict] = None) -> bool:
 
 def list_tmux_windows(config: Optional[dict] = None) -> list:
     """列出 autopilot tmux session 的所有 window 名称"""
-    tmux = _get_tmux_path(config)
     try:
-        result = subprocess.run(
-            [tmux, 'list-windows', '-t', TMUX_SESSION, '-F', '#{window_name}'],
-            capture_output=True, text=True, timeout=5
+        result = _run_tmux(
+            ['list-windows', '-t', TMUX_SESSION, '-F', '#{window_name}'], config
         )
         if result.returncode == 0:
             return [w.strip() for w in result.stdout.strip().split('\n') if w.strip()]
@@ -74,53 +345,75 @@ def list_tmux_windows(config: Optional[dict] = None) -> list:
     return []
 
 
-def get_tmux_pane_pid(window_name: str, config: Optional[dict] = None) -> Optional[int]:
-    """获取 tmux pane 中运行的进程 PID"""
-    tmux = _get_tmux_path(config)
+class PaneInfo(NamedTuple):
+    """window 当前 pane 的信息（一次 display-message 查询）"""
+    window_name: str
+    current_command: str
+    pid: Optional[int]
+
+
+_PANE_INFO_FORMAT = '#{window_name}|#{pane_current_command}|#{pane_pid}'
+
+# pane 前台是这些命令时说明 codex 未运行
+_SHELL_COMMANDS = ('bash', 'zsh', 'sh', 'fish')
+
+
+def _probe_window(window_name: str, config: Optional[dict] = None) -> Optional[PaneInfo]:
+    """
+    一次查询 window 名、pane 当前命令和 pane PID
+    
+    Returns:
+        PaneInfo，window 不存在（或名称不完全一致）时返回 None
+    """
     try:
-        result = subprocess.run(
-            [tmux, 'list-panes', '-t', f'{TMUX_SESSION}:{window_name}',
-             '-F', '#{pane_pid}'],
-            capture_output=True, text=True, timeout=5
+        result = _run_tmux(
+            ['display-message', '-p', '-t', f'{TMUX_SESSION}:{window_name}',
+             _PANE_INFO_FORMAT],
+            config
         )
-        if result.returncode == 0 and result.stdout.strip():
-            return int(result.stdout.strip().split('\n')[0])
     except Exception:
-        pass
-    return None
+        return None
+    if result.returncode != 0:
+        return None
+    
+    # window 名可能含 "|"，从右侧切分
+    parts = result.stdout.strip().split('\n')[0].rsplit('|', 2)
+    # tmux 对 -t 做前缀/模式匹配，名称必须完全一致
+    if len(parts) != 3 or parts[0] != window_name:
+        return None
+    try:
+        pid = int(parts[2])
+    except ValueError:
+        pid = None
+    return PaneInfo(parts[0], parts[1], pid)
+
+
+def get_tmux_pane_pid(window_name: str, config: Optional[dict] = None) -> Optional[int]:
+    """获取 tmux pane 中运行的进程 PID"""
+    pane = _probe_window(window_name, config)
+    return pane.pid if pane else None
 
 
 def _get_pane_command(window_name: str, config: Optional[dict] = None) -> Optional[str]:
     """获取 tmux pane 当前运行的命令名"""
-    tmux = _get_tmux_path(config)
-    try:
-        result = subprocess.run(
-            [tmux, 'list-panes', '-t', f'{TMUX_SESSION}:{window_name}',
-             '-F', '#{pane_current_command}'],
-            capture_output=True, text=True, timeout=5
-        )
-        if result.returncode == 0:
-            return result.stdout.strip().split('\n')[0]
-    except Exception:
-        pass
-    return None
+    pane = _probe_window(window_name, config)
+    return pane.current_command if pane else None
 
 
 def is_pane_running_codex(window_name: str, config: Optional[dict] = None) -> bool:
     """检查 tmux pane 是否有 codex 进程在运行"""
     cmd = _get_pane_command(window_name, config)
-    return cmd is not None and cmd not in ('bash', 'zsh', 'sh', 'fish')
+    return cmd is not None and cmd not in _SHELL_COMMANDS
 
 
 def capture_pane_output(window_name: str, lines: int = 50,
                         config: Optional[dict] = None) -> Optional[str]:
     """捕获 tmux pane 的最近输出"""
-    tmux = _get_tmux_path(config)
     try:
-        result = subprocess.run(
-            [tmux, 'capture-pane', '-t', f'{TMUX_SESSION}:{window_name}',
+        result = _run_tmux(
+            ['capture-pane', '-t', f'{TMUX_SESSION}:{window_name}',
              '-p', '-S', f'-{lines}'],
-            capture_output=True, text=True, timeout=5
+            config
         )
         if result.returncode == 0:
             return result.stdout
@@ -132,9 +425,11 @@ def capture_pane_output(window_name: str, lines: int = 50,
 def send_reply_via_tmux(reply: str, window_name: str,
                         config: Optional[dict] = None) -> bool:
     """
-    通过 tmux send-keys 发送回复到对应项目 pane
+    通过 tmux paste-buffer 发送回复到对应项目 pane
     
     Codex TUI 在该 pane 中运行，消息会出现在 TUI 中。
+    文本经 stdin 一次性写入临时 buffer 再粘贴，耗时与长度无关，
+    也不经过 send-keys 的按键名解析，无需转义。
     
     Args:
         reply: 要发送的回复文本
@@ -145,54 +440,67 @@ def send_reply_via_tmux(reply: str, window_name: str,
         是否成功
     """
     tmux = _get_tmux_path(config)
+    target = f'{TMUX_SESSION}:{window_name}'
     
-    # 检查 window 存在
-    windows = list_tmux_windows(config)
-    if window_name not in windows:
-        logger.error(f"tmux window '{window_name}' 不存在 (有: {windows})")
+    # 一次查询同时确认 window 存在和 pane 当前命令
+    pane = _probe_window(window_name, config)
+    if pane is None:
+        logger.error(f"tmux window '{window_name}' 不存在")
         return False
     
     # 检查 codex 是否在运行（防止在 shell prompt 里执行回复文本）
-    if not is_pane_running_codex(window_name, config):
+    if not pane.current_command or pane.current_command in _SHELL_COMMANDS:
         logger.error(f"tmux window '{window_name}' 中 codex 未运行，跳过发送（防误执行）")
         return False
     
+    # 将多行文本合并为单行（Codex TUI 不支持多行输入）
+    single_line = reply.replace('\n', ' ').replace('\r', ' ').strip()
+    buffer_name = f"ap_{uuid.uuid4().hex[:8]}"
+    
     try:
-        # 将多行文本合并为单行（Codex TUI 不支持多行输入）
-        # 换行符替换为空格，避免 tmux send-keys 把 \n 当回车
-        single_line = reply.replace('\n', ' ').replace('\r', ' ').strip()
-        
-        # 使用 -l (literal) 避免特殊字符被解释
-        result = subprocess.run(
-            [tmux, 'send-keys', '-t', f'{TMUX_SESSION}:{window_name}',
-             '-l', single_line],
-            capture_output=True, text=True, timeout=10
-        )
-        if result.returncode != 0:
-            logger.error(f"tmux send-keys 文本失败: {result.stderr}")
+        # 常驻连接可用时用 set-buffer 写入；文本含单引号等无法在
+        # tmux 命令行中表示时退回 load-buffer 经 stdin 写入
+        set_reply = None
+        if _tmux_client is not None:
+            set_reply = _tmux_client.cmd(
+                ['set-buffer', '-b', buffer_name, '--', single_line], timeout=10
+            )
+        if set_reply is None:
+            result = subprocess.run(
+                [tmux, 'load-buffer', '-b', buffer_name, '-'],
+                input=single_line.encode('utf-8'), capture_output=True, timeout=10
+            )
+            if result.returncode != 0:
+                logger.error(f"tmux load-buffer 失败: {result.stderr.decode('utf-8', 'replace')}")
+                return False
+        elif not set_reply[0]:
+            logger.error(f"tmux set-buffer 失败: {set_reply[1]}")
             return False
         
-        # 短暂等待确保文本输入完成
-        time.sleep(0.1)
-        
-        # 发送 Enter
-        result = subprocess.run(
-            [tmux, 'send-keys', '-t', f'{TMUX_SESSION}:{window_name}',
-             'Enter'],
-            capture_output=True, text=True, timeout=5
+        # -p: bracketed paste，TUI 把整段当作一次粘贴；Enter 在同一次调用中紧随其后
+        result = _run_tmux(
+            ['paste-buffer', '-p', '-b', buffer_name, '-t', target, ';',
+             'send-keys', '-t', target, 'Enter'],
+            config, timeout=10
         )
         if result.returncode != 0:
-            logger.error(f"tmux send-keys Enter 失败: {result.stderr}")
+            logger.error(f"tmux paste-buffer/send-keys 失败: {result.stderr}")
             return False
         
         logger.info(f"通过 tmux 发送回复 ({len(reply)}字符) 到 window={window_name}")
         return True
     except subprocess.TimeoutExpired:
-        logger.error("tmux send-keys 超时")
+        logger.error("tmux 发送超时")
         return False
     except Exception as e:
-        logger.exception(f"tmux send-keys 异常: {e}")
+        logger.exception(f"tmux 发送异常: {e}")
         return False
+    finally:
+        # paste-buffer 未带 -d，无论成功与否都清理临时 buffer
+        try:
+            _run_tmux(['delete-buffer', '-b', buffer_name], config)
+        except Exception:
+            pass
 
 
 def send_reply_via_cli(reply: str, session_id: str,
@@ -250,7 +558,7 @@ def send_reply(reply: str, project_name: str,
     """
     统一发送入口
     
-    优先 tmux send-keys（TUI 可见），失败后 fallback 到 codex exec resume
+    优先 tmux paste-buffer（TUI 可见），失败后 fallback 到 codex exec resume
     
     Args:
         reply: 回复文本
@@ -259,7 +567,7 @@ def send_reply(reply: str, project_name: str,
         project_dir: 项目目录（CLI fallback 用）
         config: 配置
     """
-    # Tier 1: tmux send-keys
+    # Tier 1: tmux paste-buffer
     if check_tmux_session(config):
         if send_reply_via_tmux(reply, project_name, config):
             return True
@@ -275,27 +583,78 @@ def send_reply(reply: str, project_name: str,
     return False
 
 
-def verify_send(session_path: str, poll_interval: int = 5,
-                max_wait: int = 30) -> bool:
+def start_pending_verify(session_path: str) -> Optional[Dict[str, Any]]:
     """
-    验证发送：检查 session JSONL 文件大小变化
+    记录发送时的 session 文件大小，供后续 tick 非阻塞验证
+    
+    Returns:
+        可写入 state.json 的待验证记录，文件不可读时返回 None
     """
     try:
-        original_size = os.path.getsize(session_path)
+        size = os.path.getsize(session_path)
     except OSError:
-        return False
-    
-    for _ in range(max_wait // poll_interval):
-        time.sleep(poll_interval)
-        try:
-            if os.path.getsize(session_path) > original_size:
-                logger.info("验证成功：Codex 已响应")
-                return True
-        except OSError:
-            continue
+        return None
+    return {'path': session_path, 'size': size, 'since': time.time()}
+
+
+def check_pending_verify(pending: Dict[str, Any], max_wait: int = 30) -> Optional[bool]:
+    """
+    检查待验证发送：session JSONL 变大即说明 Codex 已响应
     
-    logger.warning(f"验证超时：{max_wait}s 内未检测到响应")
-    return False
+    Returns:
+        True = 已响应，False = 超过 max_wait 仍未响应，None = 尚未判定
+    """
+    try:
+        if os.path.getsize(pending['path']) > pending['size']:
+            return True
+    except (OSError, KeyError, TypeError):
+        return False
+    if time.time() - pending.get('since', 0) > max_wait:
+        return False
+    return None
+
+
+# setup_tmux_session 创建 window 后等待 codex 启动的上限（秒）
+CODEX_START_WAIT = 2.0
+
+
+def _list_window_commands(config: Optional[dict] = None) -> Dict[str, str]:
+    """一次查询 autopilot session 所有 window 的 {window 名: pane 当前命令}"""
+    try:
+        result = _run_tmux(
+            ['list-panes', '-s', '-t', TMUX_SESSION,
+             '-F', '#{window_name}|#{pane_current_command}'],
+            config
+        )
+    except Exception:
+        return {}
+    if result.returncode != 0:
+        return {}
+    commands: Dict[str, str] = {}
+    for line in result.stdout.splitlines():
+        name, sep, cmd = line.rpartition('|')
+        if sep:
+            # 多 pane 的 window 取第一个 pane
+            commands.setdefault(name, cmd)
+    return commands
+
+
+def _wait_codex_started(names: List[str], config: Optional[dict] = None,
+                        timeout: float = CODEX_START_WAIT) -> None:
+    """批量等待新建 window 中 codex 启动（pane 前台不再是 shell），超时不报错"""
+    deadline = time.monotonic() + timeout
+    pending = set(names)
+    while pending:
+        commands = _list_window_commands(config)
+        pending = {
+            n for n in pending
+            if not commands.get(n) or commands[n] in _SHELL_COMMANDS
+        }
+        if not pending or time.monotonic() >= deadline:
+            break
+        time.sleep(0.1)
+    if pending:
+        logger.info(f"codex 尚未在 {sorted(pending)} 中启动，继续")
 
 
 def setup_tmux_session(projects: list, config: Optional[dict] = None) -> bool:
@@ -311,20 +670,21 @@ def setup_tmux_session(projects: list, config: Optional[dict] = None) -> bool:
     Returns:
         是否成功
     """
-    tmux = _get_tmux_path(config)
     codex = _get_codex_path(config)
     
     if not projects:
         return False
     
     session_exists = check_tmux_session(config)
-    existing_windows = list_tmux_windows(config) if session_exists else []
+    # 一次查询拿到所有已有 window 及其 pane 当前命令，而不是每个 window 单独查
+    existing_windows = _list_window_commands(config) if session_exists else {}
+    created: List[str] = []
     
     for i, (name, project_dir, session_id) in enumerate(projects):
         if name in existing_windows:
             # 检查 pane 是否有活跃进程（codex 或 node）
-            pane_cmd = _get_pane_command(name, config)
-            if pane_cmd and pane_cmd not in ('bash', 'zsh', 'sh', 'fish'):
+            pane_cmd = existing_windows[name]
+            if pane_cmd and pane_cmd not in _SHELL_COMMANDS:
                 logger.info(f"Window '{name}' 已存在且有进程 ({pane_cmd})，跳过")
                 continue
             else:
@@ -338,31 +698,33 @@ def setup_tmux_session(projects: list, config: Optional[dict] = None) -> bool:
         
         if not session_exists and i == 0:
             # 创建 session + 第一个 window
-            subprocess.run(
-                [tmux, 'new-session', '-d', '-s', TMUX_SESSION,
+            _run_tmux(
+                ['new-session', '-d', '-s', TMUX_SESSION,
                  '-n', name, '-c', project_dir],
-                capture_output=True, timeout=5
-            )
-            subprocess.run(
-                [tmux, 'send-keys', '-t', f'{TMUX_SESSION}:{name}',
-                 codex_cmd, 'Enter'],
-                capture_output=True, timeout=5
+                config
             )
             session_exists = True
+            # session 刚创建，建立常驻连接供后续 window 的命令复用
+            open_tmux_client(config)
         else:
             # 添加 window
-            subprocess.run(
-                [tmux, 'new-window', '-t', TMUX_SESSION,
+            _run_tmux(
+                ['new-window', '-t', TMUX_SESSION,
                  '-n', name, '-c', project_dir],
-                capture_output=True, timeout=5
-            )
-            subprocess.run(
-                [tmux, 'send-keys', '-t', f'{TMUX_SESSION}:{name}',
-                 codex_cmd, 'Enter'],
-                capture_output=True, timeout=5
+                config
             )
+        _run_tmux(
+            ['send-keys', '-t', f'{TMUX_SESSION}:{name}', codex_cmd, 'Enter'],
+            config
+        )
         
         logger.info(f"创建 tmux window '{name}' → codex resume {session_id[:8]}...")
-        time.sleep(1)  # 给 codex 启动时间
+        created.append(name)
+    
+    # 给 codex 启动时间：所有 window 一起等，而不是每个固定 sleep
+    if created:
+        _wait_codex_started(created, config)
     
+    # session 可能刚被创建，不能沿用缓存的 "不存在"
+    check_tmux_session.cache_clear()
     return True
@@ -6,17 +6,30 @@ Layer 2: Intent Analyzer
 """
 
 import re
-from enum import Enum
-from typing import Optional
+from bisect import bisect_right
+from itertools import accumulate
+from enum import IntEnum
+from typing import Dict, List, Optional, Tuple
 
 
-class Intent(Enum):
-    ERROR = "error"              # P1: 遇到错误
-    CHOICE = "choice"            # P2: 需要选择
-    CONFIRM = "confirm"          # P3: 需要确认
-    TASK_COMPLETE = "complete"   # P4: 任务完成
-    REVIEW = "review"            # P5: Review 标记
-    DEFAULT = "default"          # P6: 默认（Codex 停下来了但不知道为什么）
+class Intent(IntEnum):
+    """意图；取值为连续序号，可直接索引下方的元组表"""
+    ERROR = 0            # P1: 遇到错误
+    CHOICE = 1           # P2: 需要选择
+    CONFIRM = 2          # P3: 需要确认
+    TASK_COMPLETE = 3    # P4: 任务完成
+    REVIEW = 4           # P5: Review 标记
+    DEFAULT = 5          # P6: 默认（Codex 停下来了但不知道为什么）
+    
+    @property
+    def label(self) -> str:
+        """写入日志 / 历史记录的字符串标识（与原先的字符串取值一致）"""
+        return _INTENT_LABELS[self]
+
+
+# 按 Intent 序号排列
+_INTENT_LABELS = ("error", "choice", "confirm", "complete", "review", "default")
+_INTENT_DESCRIPTIONS = ("遇到错误", "需要选择", "需要确认", "任务完成", "Review 标记", "等待输入")
 
 
 # P1: 错误关键词
@@ -44,17 +57,25 @@ RESOLVED_KEYWORDS = [
 ]
 
 # P2: 选择模式（需要组合条件）
+# 跨度用 [^\n]{0,N} 限定在同一行的 N 个字符内（"同一段内"的最大距离），
+# 避免超长单行上无界 .* 的反复回溯
 CHOICE_PATTERNS = [
-    r"方案[一二三ABCD123].*(方案[一二三ABCD123]|或者|还是)",  # "方案A...方案B" 或 "方案A...或者..."
+    r"方案[一二三ABCD123][^\n]{0,200}(?:方案[一二三ABCD123]|或者|还是)",  # "方案A...方案B" 或 "方案A...或者..."
     r"(选择|选项|方案)\s*[：:]\s*\n",                        # "选择：\n 1. ..."
-    r"(还是|或者).*(呢|吗|？|\?)",                           # "还是...呢？"
+    r"(?:还是|或者)[^\n]{0,100}(?:呢|吗|？|\?)",                # "还是...呢？"
     r"(should I|would you prefer|which one|which option)",  # 英文选择
     r"(请选择|你选择|你决定|你来决定)",                      # 中文选择请求
-    r"(Option [A-D]|option [a-d]).*(Option [A-D]|option [a-d])",  # Option A ... Option B
+    r"(?:Option [A-D]|option [a-d])[^\n]{0,200}(?:Option [A-D]|option [a-d])",  # Option A ... Option B
     # 注意: 去掉了过于宽泛的 "\d+\.\s+.+\n\d+\.\s+" 编号列表模式
     # 编号列表太常见（修改记录、步骤说明等），容易误判为选择
 ]
 
+# 选择模式在导入时逐条预编译。不合并成一个大正则：各自以字面量开头时
+# 正则引擎可以按前缀快速跳过，合并后这一优化失效，实测反而更慢
+_CHOICE_RES = tuple(
+    re.compile(p, re.MULTILINE | re.IGNORECASE) for p in CHOICE_PATTERNS
+)
+
 # P3: 确认关键词
 CONFIRM_KEYWORDS = [
     "是否继续", "要不要", "确认", "确定",
@@ -103,124 +124,160 @@ REVIEW_MARKERS = [
     "审查结果", "代码审查",
 ]
 
-
-def _is_in_quote_or_comment(text: str, keyword: str) -> bool:
+def _case_groups(keywords) -> Tuple[List[str], List[str]]:
     """
-    简单启发式：检查关键词是否在引用块或代码注释中
+    关键词按大小写处理方式分组 → (不区分大小写的小写形式, 区分大小写的原词)
+
+    只有列表里本来就同时写了多种大小写的词（"error"/"Error"/"ERROR"）才不区分大小写；
+    只写了一种写法的词（"Exception"、"Traceback"、"tests passed"）保持原样精确匹配，
+    避免 "added exception handling" 这类正常输出被误判。
     """
-    lines = text.split('\n')
-    for line in lines:
-        if keyword in line:
-            stripped = line.strip()
-            # 检查是否在引用块中 (> 开头)
-            if stripped.startswith('>'):
-                return True
-            # 检查是否在代码注释中
-            if stripped.startswith('//') or stripped.startswith('#') or stripped.startswith('*'):
-                return True
-            # 检查是否在 markdown 代码块中
-            if stripped.startswith('```'):
-                return True
-    return False
+    variants: Dict[str, List[str]] = {}
+    for k in keywords:
+        group = variants.setdefault(k.lower(), [])
+        if k not in group:
+            group.append(k)
+    folded = [low for low, group in variants.items() if len(group) > 1]
+    exact = [group[0] for group in variants.values() if len(group) == 1]
+    return folded, exact
+
+
+def _keyword_re(keywords) -> "re.Pattern[str]":
+    """关键词列表 → 预编译的字面量多选正则（长词优先），一次扫描判断是否命中任一关键词"""
+    folded, exact = _case_groups(keywords)
+    alternatives = [(k, f'(?i:{re.escape(k)})') for k in folded]
+    alternatives += [(k, re.escape(k)) for k in exact]
+    alternatives.sort(key=lambda a: len(a[0]), reverse=True)
+    return re.compile('|'.join(alt for _, alt in alternatives))
+
+
+# 以下均匹配原文本（区分大小写的关键词需要原始大小写）
+_ERROR_RE = _keyword_re(ERROR_KEYWORDS)
+# 引用/注释/已解决的排除按列表中的每种写法分别判断（"Error" 在引用中不影响 "error"），
+# 各写法精确匹配，与逐词 `in text` 的判定一致
+_ERROR_KEYWORD_RES = tuple(re.compile(re.escape(k)) for k in dict.fromkeys(ERROR_KEYWORDS))
+_RESOLVED_RE = _keyword_re(RESOLVED_KEYWORDS)
+_CONFIRM_RE = _keyword_re(CONFIRM_KEYWORDS)
+_COMPLETION_RE = _keyword_re(COMPLETION_KEYWORDS)
+# Review 标记一律不区分大小写，匹配小写文本；"review" 单独按结构化用法匹配
+_REVIEW_MARKER_RE = re.compile('|'.join(
+    re.escape(m) for m in sorted(
+        {m.lower() for m in REVIEW_MARKERS if m.lower() != "review"},
+        key=len, reverse=True,
+    )
+))
+
+# 进度报告识别（_has_completion）
+_INCOMPLETE_RE = re.compile(r'(未开始|未完成|0%|\d+%.*未)')
+_PARTIAL_RE = re.compile(r'完成\s*\d+%')
+
+# "review" 结构化用法（_has_review，匹配小写文本）
+_REVIEW_WORD_RE = re.compile(r'(?<!for\s)(?<!for )\breview\s*(结果|后|发现|建议|:)')
+_CODE_REVIEW_RE = re.compile(r'(code|代码)\s*review')
+
+
+# 以这些前缀开头的行视为引用块 / 代码注释 / 代码块标记
+_QUOTE_PREFIXES = ('>', '//', '#', '*', '```')
+
+
+def _line_starts(lines: List[str]) -> List[int]:
+    """由 text.split('\\n') 的结果得到每一行起始位置的偏移（累加行长 + 换行符）"""
+    starts = list(accumulate([len(line) + 1 for line in lines], initial=0))
+    starts.pop()
+    return starts
+
+
+def _keyword_lines(text: str, keyword: "re.Pattern[str]", line_starts: List[int]) -> List[int]:
+    """包含 keyword 的所有行号；命中后直接跳到下一行继续找"""
+    found = []
+    match = keyword.search(text)
+    while match is not None:
+        line = bisect_right(line_starts, match.start()) - 1
+        found.append(line)
+        if line + 1 >= len(line_starts):
+            break
+        match = keyword.search(text, line_starts[line + 1])
+    return found
 
 
 def _has_error(text: str) -> bool:
     """检查是否有错误（且未解决）"""
-    found_error = False
+    # 绝大多数输出不含任何错误关键词：一次扫描即可排除
+    if not _ERROR_RE.search(text):
+        return False
+    
+    errors = [e for e in _ERROR_KEYWORD_RES if e.search(text)]
+    lines = text.split('\n')
+    line_starts = _line_starts(lines)
+    # 简单启发式：一次标出引用块 / 代码注释中的行
+    quoted = [line.lstrip().startswith(_QUOTE_PREFIXES) for line in lines]
+    # 一次扫描标出含解决关键词的行（关键词不跨行，行内有任一关键词必有一处匹配）
+    resolved_matches = list(_RESOLVED_RE.finditer(text))
+    resolved_lines = {bisect_right(line_starts, m.start()) - 1 for m in resolved_matches}
     
-    # 检查错误关键词
-    for error in ERROR_KEYWORDS:
-        if error in text:
-            # 排除引用/注释中的误判
-            if not _is_in_quote_or_comment(text, error):
-                # 检查同一句中是否已解决
-                # 找包含该错误关键词的所有行
-                error_resolved = True
-                for line in text.split('\n'):
-                    if error in line:
-                        # 该行是否也包含解决关键词？
-                        line_resolved = any(r in line for r in RESOLVED_KEYWORDS)
-                        if not line_resolved:
-                            error_resolved = False
-                            break
-                
-                if not error_resolved:
-                    found_error = True
-                    break
+    found_error = False
+    for error in errors:
+        error_lines = _keyword_lines(text, error, line_starts)
+        # 排除引用/注释中的误判（任一出现处在引用/注释中即排除）
+        if any(quoted[i] for i in error_lines):
+            continue
+        # 检查同一句中是否已解决：只要有一行含错误但不含解决关键词，就算未解决
+        if any(i not in resolved_lines for i in error_lines):
+            found_error = True
+            break
     
     if not found_error:
         return False
     
-    # 全局检查：如果文本整体是"修复完成"的语气
-    for resolved in RESOLVED_KEYWORDS:
-        if resolved in text:
-            # 如果解决关键词出现在错误关键词之前，认为已修复
-            for error in ERROR_KEYWORDS:
-                if error in text:
-                    resolved_pos = text.find(resolved)
-                    error_pos = text.find(error)
-                    if resolved_pos < error_pos:
-                        return False
+    # 全局检查：如果文本整体是"修复完成"的语气——
+    # 任一解决关键词（最左匹配即最早出现者）出现在任一错误关键词之前，认为已修复；
+    # 错误位置按列表中每种写法各自的首次出现计
+    if resolved_matches:
+        last_error_pos = max(text.find(e) for e in ERROR_KEYWORDS)
+        if resolved_matches[0].start() < last_error_pos:
+            return False
     
     return True
 
 
 def _has_choice(text: str) -> bool:
     """检查是否需要选择"""
-    for pattern in CHOICE_PATTERNS:
-        if re.search(pattern, text, re.MULTILINE | re.IGNORECASE):
-            return True
-    return False
+    return any(r.search(text) for r in _CHOICE_RES)
 
 
 def _has_confirm(text: str) -> bool:
     """检查是否需要确认"""
-    for keyword in CONFIRM_KEYWORDS:
-        if keyword in text:
-            return True
-    return False
+    return _CONFIRM_RE.search(text) is not None
 
 
 def _has_completion(text: str) -> bool:
     """检查是否任务完成（排除进度报告中的部分完成）"""
-    import re
-    
     # 如果文本中有明确的"未完成"信号，说明是进度报告
-    has_incomplete = bool(re.search(r'(未开始|未完成|0%|\d+%.*未)', text))
+    has_incomplete = bool(_INCOMPLETE_RE.search(text))
     # "完成 50%" 这种百分比模式是进度报告
-    has_partial = bool(re.search(r'完成\s*\d+%', text))
+    has_partial = bool(_PARTIAL_RE.search(text))
     
     if has_incomplete and has_partial:
         # 明确是进度报告（有完成也有未完成）
         return False
     
-    for keyword in COMPLETION_KEYWORDS:
-        if keyword in text:
-            return True
-    
-    return False
+    return _COMPLETION_RE.search(text) is not None
 
 
-def _has_review(text: str) -> bool:
-    """检查是否有 Review 标记"""
-    import re
-    text_lower = text.lower()
+def _has_review(text_lower: str) -> bool:
+    """检查是否有 Review 标记；text_lower 为已小写的文本"""
+    if _REVIEW_MARKER_RE.search(text_lower):
+        return True
     
-    for marker in REVIEW_MARKERS:
-        marker_lower = marker.lower()
-        
-        # "review" 需要特殊处理：排除 "for review"、"ready for review" 等
-        if marker_lower == "review":
-            # 匹配 "review 结果"、"review 后"、"code review"、行首 "review:" 等
-            # 排除 "for review"、"ready for review"
-            if re.search(r'(?<!for\s)(?<!for )\breview\s*(结果|后|发现|建议|:)', text_lower):
-                return True
-            if re.search(r'(code|代码)\s*review', text_lower):
-                return True
-            continue
-        
-        if marker_lower in text_lower:
-            return True
+    # "review" 需要特殊处理：排除 "for review"、"ready for review" 等
+    # 匹配 "review 结果"、"review 后"、"code review"、行首 "review:" 等
+    # 两个正则都要求出现 "review"，先用子串检查排除绝大多数文本
+    if "review" not in text_lower:
+        return False
+    if _REVIEW_WORD_RE.search(text_lower):
+        return True
+    if _CODE_REVIEW_RE.search(text_lower):
+        return True
     
     return False
 
@@ -257,7 +314,7 @@ def analyze_intent(text: Optional[str]) -> Intent:
         return Intent.CONFIRM
     
     # P4: Review 标记（优先于完成——review 里常含"完成"等词）
-    if _has_review(text):
+    if _has_review(text.lower()):
         return Intent.REVIEW
     
     # P5: 任务完成
@@ -270,12 +327,4 @@ def analyze_intent(text: Optional[str]) -> Intent:
 
 def get_intent_description(intent: Intent) -> str:
     """获取意图的中文描述"""
-    descriptions = {
-        Intent.ERROR: "遇到错误",
-        Intent.CHOICE: "需要选择",
-        Intent.CONFIRM: "需要确认",
-        Intent.TASK_COMPLETE: "任务完成",
-        Intent.REVIEW: "Review 标记",
-        Intent.DEFAULT: "等待输入",
-    }
-    return descriptions.get(intent, "未知")
+    return _INTENT_DESCRIPTIONS[intent]
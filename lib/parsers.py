@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+可选加速的 JSON / YAML 解析
+- orjson 可用时用 orjson.loads，否则退回标准库 json.loads
+- PyYAML 编译了 libyaml 时用 CSafeLoader，否则退回纯 Python 的 SafeLoader
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson 可选，缺失时退回标准库
+    orjson = None
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML 未编译 libyaml 时退回纯 Python 实现
+    from yaml import SafeLoader
+
+json_loads = orjson.loads if orjson is not None else json.loads
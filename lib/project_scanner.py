@@ -5,10 +5,48 @@ Layer 2: Project Scanner
 - 统计里程碑完成度
 """
 
+import fnmatch
 import os
 from dataclasses import dataclass
-from glob import glob
-from typing import Dict, List, Optional
+from glob import has_magic
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+# ** 递归时跳过的依赖 / 构建产物目录：体积大且不代表项目自身进度
+PRUNED_DIRS = frozenset({
+    'node_modules', '.git', '.venv', 'venv', '__pycache__',
+    'target', 'dist', 'build',
+})
+
+# 各项目类型的默认里程碑（只读）：{名称: (文件路径/glob 模式, ...)}
+# Node.js / Next.js / React 项目
+_NODE_MS: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "M1-Init": ("package.json", "tsconfig.json"),
+    "M2-Core": ("src/**/*.ts", "src/**/*.tsx"),
+    "M3-Tests": ("**/*.test.ts", "**/*.test.tsx", "**/*.spec.ts"),
+})
+# Rust 项目
+_RUST_MS: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "M1-Init": ("Cargo.toml", "Cargo.lock"),
+    "M2-Core": ("src/**/*.rs",),
+})
+# Python 项目：M1 取 pyproject.toml，没有时退回 requirements.txt
+_PY_CORE_MS = ("**/*.py",)
+_PY_TESTS_MS = ("tests/**/*.py", "test_*.py")
+_PY_MS_PYPROJECT: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "M1-Init": ("pyproject.toml",),
+    "M2-Core": _PY_CORE_MS,
+    "M3-Tests": _PY_TESTS_MS,
+})
+_PY_MS_REQS: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "M1-Init": ("requirements.txt",),
+    "M2-Core": _PY_CORE_MS,
+    "M3-Tests": _PY_TESTS_MS,
+})
+# 未知项目类型
+_UNK_MS: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "M1-Files": ("*",),
+})
 
 
 @dataclass
@@ -37,8 +75,11 @@ class ProjectProgress:
     def overall_percentage(self) -> int:
         if not self.milestones:
             return 0
-        total = sum(m.total_files for m in self.milestones)
-        existing = sum(m.existing_files for m in self.milestones)
+        # 一次遍历同时累加两项
+        total = existing = 0
+        for m in self.milestones:
+            total += m.total_files
+            existing += m.existing_files
         if total == 0:
             return 100
         return int((existing / total) * 100)
@@ -60,6 +101,21 @@ def scan_project_progress(project_dir: str,
     if milestones is None:
         milestones = _detect_default_milestones(project_dir)
     
+    return _scan_milestones(project_dir, milestones)
+
+
+def _scan_milestones(project_dir: str,
+                     milestones: Mapping[str, Sequence[str]]) -> ProjectProgress:
+    """按里程碑定义逐项检查文件 / glob 是否存在"""
+    # 所有里程碑的 glob 模式一起求值，同一根目录只遍历一次
+    glob_patterns = [
+        pattern
+        for patterns in milestones.values()
+        for pattern in patterns
+        if '*' in pattern or '?' in pattern
+    ]
+    matched = _glob_matches(project_dir, glob_patterns) if glob_patterns else set()
+    
     milestone_progress = []
     
     for name, patterns in milestones.items():
@@ -67,16 +123,13 @@ def scan_project_progress(project_dir: str,
         existing = 0
         
         for pattern in patterns:
-            full_pattern = os.path.join(project_dir, pattern)
-            
             if '*' in pattern or '?' in pattern:
                 # Glob 模式
-                matches = glob(full_pattern, recursive=True)
-                if matches:
+                if pattern in matched:
                     existing += 1
             else:
                 # 具体文件路径
-                if os.path.exists(full_pattern):
+                if os.path.exists(os.path.join(project_dir, pattern)):
                     existing += 1
         
         milestone_progress.append(MilestoneProgress(
@@ -91,61 +144,139 @@ def scan_project_progress(project_dir: str,
     )
 
 
-def _detect_default_milestones(project_dir: str) -> Dict[str, List[str]]:
+def _glob_matches(project_dir: str, patterns: List[str]) -> set:
     """
-    根据项目类型检测默认的里程碑
+    返回 patterns 中在 project_dir 下存在匹配的那些
+
+    按字面前缀（第一个通配段之前的部分）分组，每组一次 os.walk，
+    所有模式都命中即提前结束；含隐藏通配段的少见模式单独用 _glob_any。
     """
-    milestones = {}
-    
-    # 检测项目类型
-    has_package_json = os.path.exists(os.path.join(project_dir, "package.json"))
-    has_cargo_toml = os.path.exists(os.path.join(project_dir, "Cargo.toml"))
-    has_pyproject = os.path.exists(os.path.join(project_dir, "pyproject.toml"))
-    has_requirements = os.path.exists(os.path.join(project_dir, "requirements.txt"))
-    
-    if has_package_json:
-        # Node.js / Next.js / React 项目
-        milestones["M1-Init"] = [
-            "package.json",
-            "tsconfig.json",
-        ]
-        milestones["M2-Core"] = [
-            "src/**/*.ts",
-            "src/**/*.tsx",
-        ]
-        milestones["M3-Tests"] = [
-            "**/*.test.ts",
-            "**/*.test.tsx",
-            "**/*.spec.ts",
-        ]
-    elif has_cargo_toml:
-        # Rust 项目
-        milestones["M1-Init"] = [
-            "Cargo.toml",
-            "Cargo.lock",
-        ]
-        milestones["M2-Core"] = [
-            "src/**/*.rs",
-        ]
-    elif has_pyproject or has_requirements:
-        # Python 项目
-        milestones["M1-Init"] = [
-            "pyproject.toml" if has_pyproject else "requirements.txt",
-        ]
-        milestones["M2-Core"] = [
-            "**/*.py",
-        ]
-        milestones["M3-Tests"] = [
-            "tests/**/*.py",
-            "test_*.py",
+    matched = set()
+    groups: Dict[str, List[Tuple[str, List[str]]]] = {}
+    for pattern in dict.fromkeys(patterns):
+        parts = [p for p in pattern.split('/') if p]
+        first_magic = next((i for i, p in enumerate(parts) if has_magic(p)), len(parts))
+        root, rest = parts[:first_magic], parts[first_magic:]
+        if not rest or any(p.startswith('.') for p in rest) or all(p == '**' for p in rest):
+            if _glob_any(project_dir, pattern):
+                matched.add(pattern)
+            continue
+        groups.setdefault(os.path.join(project_dir, *root), []).append((pattern, rest))
+    
+    for root, pending in groups.items():
+        matched.update(_walk_matches(root, pending))
+    return matched
+
+
+def _walk_matches(root: str, pending: List[Tuple[str, List[str]]]) -> List[str]:
+    """在 root 下遍历一次，返回有匹配的模式；不含 ** 时只下探到模式的最大深度"""
+    found = []
+    recursive = any('**' in rest for _, rest in pending)
+    max_depth = max(len(rest) for _, rest in pending)
+    
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel = os.path.relpath(dirpath, root)
+        rel_parts = [] if rel == '.' else rel.split(os.sep)
+        # 与 glob 一致：通配符不进入隐藏目录；另外跳过依赖 / 构建目录
+        dirnames[:] = [
+            d for d in dirnames if not d.startswith('.') and d not in PRUNED_DIRS
         ]
+        
+        for name in dirnames + filenames:
+            if name.startswith('.'):
+                continue
+            path_parts = rel_parts + [name]
+            for item in [item for item in pending if _match_segments(item[1], path_parts)]:
+                pending.remove(item)
+                found.append(item[0])
+            if not pending:
+                return found
+        
+        if not recursive and len(rel_parts) + 1 >= max_depth:
+            dirnames[:] = []
+    return found
+
+
+def _match_segments(pattern: List[str], path: List[str]) -> bool:
+    """按路径段匹配：** 匹配零或多层目录，其余段按 fnmatch 匹配单个名字"""
+    if not pattern:
+        return not path
+    if pattern[0] == '**':
+        return _match_segments(pattern[1:], path) or (
+            bool(path) and _match_segments(pattern, path[1:])
+        )
+    return (bool(path) and fnmatch.fnmatch(path[0], pattern[0])
+            and _match_segments(pattern[1:], path[1:]))
+
+
+def _glob_any(project_dir: str, pattern: str) -> bool:
+    """
+    project_dir 下是否存在匹配 pattern（支持 ** 递归）的文件或目录
+
+    逐级 scandir，找到第一个匹配即返回。通配符不匹配隐藏项（同 glob）；
+    ** 不进入 PRUNED_DIRS 中的目录，也不跟随目录符号链接。
+    """
+    parts = [p for p in pattern.split('/') if p]
+    return bool(parts) and _match_any(project_dir, parts)
+
+
+def _match_any(dir_path: str, parts: List[str]) -> bool:
+    segment, rest = parts[0], parts[1:]
+    
+    if not has_magic(segment):
+        path = os.path.join(dir_path, segment)
+        if rest:
+            return os.path.isdir(path) and _match_any(path, rest)
+        return os.path.lexists(path)
+    
+    if segment == '**':
+        # ** 匹配零层或多层目录
+        if not rest or _match_any(dir_path, rest):
+            return True
+        match = None
     else:
-        # 未知项目类型
-        milestones["M1-Files"] = [
-            "*",
-        ]
+        match = segment
+    
+    include_hidden = segment.startswith('.')
+    try:
+        with os.scandir(dir_path) as it:
+            entries = [e for e in it if include_hidden or not e.name.startswith('.')]
+    except OSError:
+        return False
     
-    return milestones
+    for entry in entries:
+        if match is None:
+            if (entry.name not in PRUNED_DIRS and entry.is_dir(follow_symlinks=False)
+                    and _match_any(entry.path, parts)):
+                return True
+            continue
+        if not fnmatch.fnmatch(entry.name, match):
+            continue
+        if not rest:
+            return True
+        if entry.is_dir() and _match_any(entry.path, rest):
+            return True
+    return False
+
+
+def _detect_default_milestones(project_dir: str) -> Mapping[str, Tuple[str, ...]]:
+    """
+    根据项目类型检测默认的里程碑
+
+    返回模块级只读表的引用，调用方不得修改；按优先级依次探测，命中即返回
+    """
+    def exists(name: str) -> bool:
+        return os.path.exists(os.path.join(project_dir, name))
+
+    if exists("package.json"):
+        return _NODE_MS
+    if exists("Cargo.toml"):
+        return _RUST_MS
+    if exists("pyproject.toml"):
+        return _PY_MS_PYPROJECT
+    if exists("requirements.txt"):
+        return _PY_MS_REQS
+    return _UNK_MS
 
 
 def format_progress(progress: ProjectProgress) -> str:
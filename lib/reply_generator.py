@@ -46,23 +46,8 @@ def generate_reply(intent: Intent, context: Optional[str] = None,
     Returns:
         回复文本
     """
-    base_reply = REPLY_TEMPLATES.get(intent, REPLY_TEMPLATES[Intent.DEFAULT])
-    
-    # 根据意图 + 输出内容生成更精准的回复
-    if intent == Intent.ERROR:
-        return _generate_error_reply(last_output, context)
-    elif intent == Intent.CHOICE:
-        return _generate_choice_reply(last_output, context)
-    elif intent == Intent.CONFIRM:
-        return "是的，继续。"
-    elif intent == Intent.TASK_COMPLETE:
-        return _generate_complete_reply(last_output, context)
-    elif intent == Intent.REVIEW:
-        return _generate_review_reply(last_output, context)
-    elif intent == Intent.DEFAULT:
-        return _generate_default_reply(last_output, context)
-    
-    return base_reply
+    # 根据意图 + 输出内容生成更精准的回复（按意图序号直接查表分派）
+    return _INTENT_DISPATCH[intent](last_output, context)
 
 
 def _generate_error_reply(output: Optional[str], context: Optional[str]) -> str:
@@ -93,6 +78,11 @@ def _generate_choice_reply(output: Optional[str], context: Optional[str]) -> str
     return "用你的专业判断选择最合适的方案，直接执行。优先考虑：简洁性、可维护性、性能。不需要再问我。"
 
 
+def _generate_confirm_reply(output: Optional[str], context: Optional[str]) -> str:
+    """确认请求的回复"""
+    return "是的，继续。"
+
+
 def _generate_complete_reply(output: Optional[str], context: Optional[str]) -> str:
     """任务完成后的回复"""
     return "好的。检查还有没有待办事项，有的话继续处理，没有就做一个完整的自检和总结。"
@@ -128,6 +118,21 @@ def _generate_default_reply(output: Optional[str], context: Optional[str]) -> st
     return "继续。"
 
 
+# 意图 → 回复生成函数（按 Intent 序号排列，直接下标分派）
+_INTENT_DISPATCH = (
+    _generate_error_reply,       # Intent.ERROR
+    _generate_choice_reply,      # Intent.CHOICE
+    _generate_confirm_reply,     # Intent.CONFIRM
+    _generate_complete_reply,    # Intent.TASK_COMPLETE
+    _generate_review_reply,      # Intent.REVIEW
+    _generate_default_reply,     # Intent.DEFAULT
+)
+
+
+# 无参数时的"推一把"回复
+_PUSH_EMPTY = "继续。"
+
+
 def generate_push_reply(task_name: Optional[str] = None, 
                         progress: Optional[str] = None,
                         remaining: Optional[str] = None) -> str:
@@ -142,6 +147,9 @@ def generate_push_reply(task_name: Optional[str] = None,
     Returns:
         回复文本
     """
+    if not (task_name or progress or remaining):
+        return _PUSH_EMPTY
+    
     parts = ["继续"]
     
     if task_name:
@@ -172,8 +180,6 @@ def generate_done_failed_reply(
     Returns:
         回复文本
     """
-    from .done_checker import DoneResult
-    
     parts = []
     
     if task_name:
@@ -193,6 +199,12 @@ def generate_done_failed_reply(
     return "\n".join(parts)
 
 
+# 下一任务回复模板：按是否有刚完成的任务 / 完成摘要三选一
+_NEXT_TASK_TPL = "现在开始下一个任务：\n\n{prompt}"
+_NEXT_TASK_DONE_TPL = "✅ 任务「{name}」已完成！\n\n" + _NEXT_TASK_TPL
+_NEXT_TASK_DONE_MSG_TPL = "✅ 任务「{name}」已完成！\n摘要: {msg}\n\n" + _NEXT_TASK_TPL
+
+
 def generate_next_task_reply(
     next_prompt: str,
     completed_task_name: Optional[str] = None,
@@ -209,19 +221,13 @@ def generate_next_task_reply(
     Returns:
         回复文本
     """
-    parts = []
-    
-    if completed_task_name:
-        parts.append(f"✅ 任务「{completed_task_name}」已完成！")
-        if on_complete_msg:
-            parts.append(f"摘要: {on_complete_msg}")
-        parts.append("")
-    
-    parts.append("现在开始下一个任务：")
-    parts.append("")
-    parts.append(next_prompt)
-    
-    return "\n".join(parts)
+    if not completed_task_name:
+        return _NEXT_TASK_TPL.format(prompt=next_prompt)
+    if on_complete_msg:
+        return _NEXT_TASK_DONE_MSG_TPL.format(
+            name=completed_task_name, msg=on_complete_msg, prompt=next_prompt
+        )
+    return _NEXT_TASK_DONE_TPL.format(name=completed_task_name, prompt=next_prompt)
 
 
 def generate_all_tasks_complete_reply(
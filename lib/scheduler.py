@@ -6,15 +6,14 @@ Layer 4: Multi-Project Scheduler (多项目调度器)
 - 全局资源控制
 """
 
+import contextlib
 import logging
 import os
 from dataclasses import dataclass, field
-from datetime import datetime
 from enum import Enum
+from operator import itemgetter
 from typing import Any, Dict, List, Optional, Tuple
 
-import yaml
-
 from .task_orchestrator import TasksConfig, load_tasks
 
 logger = logging.getLogger(__name__)
@@ -54,20 +53,8 @@ class ProjectInfo:
     
     @classmethod
     def from_tasks_config(cls, tasks_config: TasksConfig, 
-                           tasks_yaml_path: str) -> "ProjectInfo":
-        """从 TasksConfig 创建 ProjectInfo"""
-        # 从 tasks.yaml 提取项目级覆盖
-        overrides = {}
-        
-        # 尝试读取完整的 YAML 获取 overrides
-        try:
-            with open(tasks_yaml_path, 'r', encoding='utf-8') as f:
-                data = yaml.safe_load(f)
-                project_data = data.get("project", {})
-                overrides = project_data.get("overrides", {})
-        except Exception:
-            pass
-        
+                           tasks_yaml_path: Optional[str] = None) -> "ProjectInfo":
+        """从 TasksConfig 创建 ProjectInfo（项目级覆盖已由 load_tasks 解析，不再重读文件）"""
         return cls(
             name=tasks_config.project_name or os.path.basename(tasks_config.project_dir),
             dir=tasks_config.project_dir,
@@ -76,7 +63,7 @@ class ProjectInfo:
             lifecycle=ProjectLifecycle.ENABLED if tasks_config.enabled else ProjectLifecycle.DISABLED,
             tasks_config=tasks_config,
             description=tasks_config.description,
-            overrides=overrides,
+            overrides=tasks_config.overrides,
         )
 
 
@@ -97,24 +84,26 @@ def load_all_projects(config: Dict[str, Any]) -> List[ProjectInfo]:
     projects: Dict[str, ProjectInfo] = {}  # name -> ProjectInfo
     
     # 1. 扫描 ~/.autopilot/projects/*/tasks.yaml
-    if os.path.isdir(PROJECTS_DIR):
-        for entry in os.listdir(PROJECTS_DIR):
-            project_path = os.path.join(PROJECTS_DIR, entry)
-            if not os.path.isdir(project_path):
-                continue
-            
-            tasks_yaml = os.path.join(project_path, "tasks.yaml")
-            if not os.path.exists(tasks_yaml):
-                continue
-            
-            tasks_config = load_tasks(tasks_yaml)
-            if not tasks_config:
-                logger.warning(f"无法加载项目 {entry} 的 tasks.yaml")
-                continue
-            
-            project = ProjectInfo.from_tasks_config(tasks_config, tasks_yaml)
-            projects[project.name] = project
-            logger.info(f"从 projects/ 加载项目: {project.name} (priority={project.priority})")
+    # scandir 的 DirEntry 自带文件类型，省去逐项 isdir 的 stat
+    try:
+        with os.scandir(PROJECTS_DIR) as it:
+            project_entries = [entry for entry in it if entry.is_dir()]
+    except OSError:
+        project_entries = []
+    
+    for entry in project_entries:
+        tasks_yaml = os.path.join(entry.path, "tasks.yaml")
+        if not os.path.exists(tasks_yaml):
+            continue
+        
+        tasks_config = load_tasks(tasks_yaml)
+        if not tasks_config:
+            logger.warning(f"无法加载项目 {entry.name} 的 tasks.yaml")
+            continue
+        
+        project = ProjectInfo.from_tasks_config(tasks_config, tasks_yaml)
+        projects[project.name] = project
+        logger.info(f"从 projects/ 加载项目: {project.name} (priority={project.priority})")
     
     # 2. 从 config.yaml 的 project_dirs 加载
     project_dirs = config.get('project_dirs', [])
@@ -199,11 +188,16 @@ def schedule_projects(
     Returns:
         本轮应处理的项目列表（已按策略排序）
     """
-    from .state_manager import check_cooldown, check_daily_limit, get_project_state
+    from .state_manager import (
+        check_cooldown, check_daily_limit, get_last_send_ts, get_project_state,
+    )
     
     scheduler_config = config.get('scheduler', {})
     strategy = scheduler_config.get('strategy', 'round-robin')
-    max_sends_per_tick = scheduler_config.get('max_sends_per_tick', 1)
+    # 全局默认值每轮只取一次，项目级覆盖直接查 overrides
+    default_cooldown = config.get('cooldown', 120)
+    default_max_daily = config.get('max_daily_sends', 50)
+    by_priority = strategy == "priority"
     
     # 过滤可操作的项目
     actionable: List[Tuple[ProjectInfo, float]] = []  # (project, sort_key)
@@ -225,41 +219,29 @@ def schedule_projects(
         
         # 检查冷却期
         proj_state = get_project_state(global_state, project.dir)
-        cooldown = project.get_override('cooldown', config.get('cooldown', 120))
+        cooldown = project.get_override('cooldown', default_cooldown)
         if check_cooldown(proj_state, cooldown):
             logger.debug(f"跳过项目 {project.name}: 在冷却期")
             continue
         
         # 检查每日限额
-        max_daily = project.get_override('max_daily_sends', config.get('max_daily_sends', 50))
+        max_daily = project.get_override('max_daily_sends', default_max_daily)
         if check_daily_limit(proj_state, max_daily):
             logger.debug(f"跳过项目 {project.name}: 达到每日限额")
             continue
         
         # 计算排序键
-        if strategy == "priority":
+        if by_priority:
             sort_key = project.priority
         else:
-            # round-robin: 按上次发送时间排序（最久未发送的优先）
-            last_send = proj_state.last_send_at
-            if last_send:
-                try:
-                    sort_key = datetime.fromisoformat(last_send).timestamp()
-                except ValueError:
-                    sort_key = 0
-            else:
-                sort_key = 0  # 从未发送过的优先
+            # round-robin: 按上次发送时间排序（从未发送、最久未发送的优先）
+            sort_key = get_last_send_ts(proj_state) or 0
         
         actionable.append((project, sort_key))
     
-    # 排序
-    if strategy == "priority":
-        # 优先级：数字越小越高
-        actionable.sort(key=lambda x: x[1])
-    else:
-        # round-robin: 所有可操作项目都应轮流处理
-        # 按上次发送时间排序（最久未发送的优先）
-        actionable.sort(key=lambda x: x[1])
+    # 排序（稳定排序，键相同保持原顺序）
+    # priority: 数字越小越高；round-robin: 最久未发送的优先，所有可操作项目轮流处理
+    actionable.sort(key=itemgetter(1))
     
     # 返回所有可操作项目（不截断），让主循环控制发送次数
     result = [p for p, _ in actionable]
@@ -268,6 +250,12 @@ def schedule_projects(
     return result
 
 
+def _state_lock(global_state: Any):
+    """返回 global_state 上的锁（没有则返回空上下文）"""
+    lock = getattr(global_state, 'lock', None)
+    return lock if lock is not None else contextlib.nullcontext()
+
+
 def update_project_lifecycle(
     project: ProjectInfo,
     new_lifecycle: ProjectLifecycle,
@@ -286,27 +274,28 @@ def update_project_lifecycle(
     old_lifecycle = project.lifecycle
     project.lifecycle = new_lifecycle
     
-    # 更新 global_state
-    active_projects = getattr(global_state, 'active_projects', []) or []
-    paused_projects = getattr(global_state, 'paused_projects', []) or []
-    
-    # 从旧列表中移除
-    if project.name in active_projects:
-        active_projects.remove(project.name)
-    if project.name in paused_projects:
-        paused_projects.remove(project.name)
-    
-    # 添加到新列表
-    if new_lifecycle in (ProjectLifecycle.ENABLED, ProjectLifecycle.RUNNING):
-        if project.name not in active_projects:
-            active_projects.append(project.name)
-    elif new_lifecycle == ProjectLifecycle.PAUSED:
-        if project.name not in paused_projects:
-            paused_projects.append(project.name)
-    
-    # 更新 global_state
-    global_state.active_projects = active_projects
-    global_state.paused_projects = paused_projects
+    with _state_lock(global_state):
+        # 更新 global_state
+        active_projects = getattr(global_state, 'active_projects', []) or []
+        paused_projects = getattr(global_state, 'paused_projects', []) or []
+        
+        # 从旧列表中移除
+        if project.name in active_projects:
+            active_projects.remove(project.name)
+        if project.name in paused_projects:
+            paused_projects.remove(project.name)
+        
+        # 添加到新列表
+        if new_lifecycle in (ProjectLifecycle.ENABLED, ProjectLifecycle.RUNNING):
+            if project.name not in active_projects:
+                active_projects.append(project.name)
+        elif new_lifecycle == ProjectLifecycle.PAUSED:
+            if project.name not in paused_projects:
+                paused_projects.append(project.name)
+        
+        # 更新 global_state
+        global_state.active_projects = active_projects
+        global_state.paused_projects = paused_projects
     
     logger.info(f"项目 {project.name} 生命周期: {old_lifecycle.value} -> {new_lifecycle.value}")
 
@@ -324,20 +313,22 @@ def update_project_send_order(
         project_name: 项目名称
         global_state: 全局状态
     """
-    send_order = getattr(global_state, 'project_send_order', []) or []
-    
-    # 移除已有的
-    if project_name in send_order:
-        send_order.remove(project_name)
-    
-    # 添加到末尾
-    send_order.append(project_name)
-    
-    # 保持列表不超过 100 项
-    if len(send_order) > 100:
-        send_order = send_order[-100:]
-    
-    global_state.project_send_order = send_order
+    with _state_lock(global_state):
+        send_order = getattr(global_state, 'project_send_order', []) or []
+        
+        # 移除已有的（单次扫描）
+        try:
+            send_order.remove(project_name)
+        except ValueError:
+            pass
+        
+        # 添加到末尾
+        send_order.append(project_name)
+        
+        # 保持列表不超过 100 项（原地删除头部，不复制整个列表）
+        del send_order[:-100]
+        
+        global_state.project_send_order = send_order
 
 
 def get_project_by_name(
@@ -358,14 +349,13 @@ def get_project_by_name(
     """
     name_lower = name.lower()
     
-    # 精确匹配
-    for project in projects:
-        if project.name.lower() == name_lower:
-            return project
-    
-    # 前缀匹配
+    # 一次遍历：精确匹配立即返回，同时记下第一个前缀匹配
+    prefix_match: Optional[ProjectInfo] = None
     for project in projects:
-        if project.name.lower().startswith(name_lower):
+        project_lower = project.name.lower()
+        if project_lower == name_lower:
             return project
+        if prefix_match is None and project_lower.startswith(name_lower):
+            prefix_match = project
     
-    return None
+    return prefix_match
@@ -7,14 +7,18 @@ Layer 1: Session Monitor
 """
 
 import json
+import mmap
 import os
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import date, timedelta
 from enum import Enum
-from glob import glob
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from .parsers import json_loads as _json_loads
 
 # 状态判定阈值 (秒)
 ACTIVE_THRESHOLD = 120   # < 120s = Codex 正在工作
@@ -28,14 +32,23 @@ class SessionState(Enum):
     DONE = "done"        # 长时间无活动
 
 
+_UUID_RE = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+_UUID_HEX = frozenset('0123456789abcdef')
+
+
 def _extract_session_id(jsonl_path: str) -> Optional[str]:
     """从 JSONL 文件名提取 session UUID"""
     # 格式: rollout-2026-02-06T21-49-15-019c36a5-b6ef-75f0-b9f6-0bcee9c3e085.jsonl
-    import re
     basename = os.path.basename(jsonl_path)
-    # UUID 格式: 8-4-4-4-12 hex
-    match = re.search(r'([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})', basename)
-    return match.group(1) if match else None
+    # 常见格式 UUID 紧挨 .jsonl，直接切片校验（8-4-4-4-12 hex）
+    if basename.endswith('.jsonl'):
+        uuid = basename[-42:-6]
+        if (len(uuid) == 36 and uuid[8] == uuid[13] == uuid[18] == uuid[23] == '-'
+                and _UUID_HEX.issuperset(uuid.replace('-', ''))):
+            return uuid
+    # 其他命名退回正则搜索
+    match = _UUID_RE.search(basename)
+    return match.group(0) if match else None
 
 
 @dataclass
@@ -51,26 +64,128 @@ class SessionInfo:
         return time.time() - self.mtime
 
 
-# 缓存: {jsonl_path → cwd}
-# session_meta 是第一行，不会变，只需读一次
-_session_meta_cache: Dict[str, str] = {}
+# 缓存: {jsonl_path → (st_ino, cwd, session_id)}
+# session_meta 是第一行，不会变，只需读一次；持久化到磁盘，进程重启后沿用
+# JSONL 追加写会改变 mtime，因此只用 inode 校验（文件被替换/轮转时 inode 变化）
+SESSION_META_CACHE_PATH = "~/.autopilot/cache/session_meta.json"
+_session_meta_cache: Dict[str, Tuple[int, str, Optional[str]]] = {}
+_session_meta_loaded = False
+# 未命中超过该数量时用线程池并发读取首行
+META_READ_PARALLEL_MIN = 4
+META_READ_WORKERS = 16
+
+# 尾部逆向扫描的最大字节数
+# 大 session 可能 100+MB，200KB 足够覆盖最后的 assistant 消息
+TAIL_SCAN_BYTES = 200 * 1024
+# 判定最后一条是否为 user message 时的最大逆向扫描字节数
+USER_SCAN_BYTES = 50 * 1024
+# 逆向扫描逐步扩大的窗口（字节），最后一级为完整扫描范围
+TAIL_SCAN_STEPS = (8 * 1024, 32 * 1024)
+
+# mmap.madvise 需要 Python 3.8+ 且平台提供 MADV_WILLNEED
+_MADV_WILLNEED = getattr(mmap, 'MADV_WILLNEED', None) if hasattr(mmap.mmap, 'madvise') else None
 
 
 def _read_session_meta(jsonl_path: str) -> Optional[str]:
     """读取 session JSONL 第一行的 cwd"""
     try:
-        with open(jsonl_path, 'r', encoding='utf-8') as f:
+        with open(jsonl_path, 'rb') as f:
             line = f.readline()
-            if not line:
-                return None
-            data = json.loads(line)
-            if data.get('type') == 'session_meta':
-                return data.get('payload', {}).get('cwd')
-    except (json.JSONDecodeError, IOError, OSError):
+        if not line:
+            return None
+        data = _json_loads(line)
+        if data.get('type') == 'session_meta':
+            return data.get('payload', {}).get('cwd')
+    except (ValueError, IOError, OSError):
         pass
     return None
 
 
+def _load_session_meta_cache() -> None:
+    """从磁盘载入 session_meta 缓存（每个进程只载入一次，文件损坏时忽略）"""
+    global _session_meta_loaded
+    if _session_meta_loaded:
+        return
+    _session_meta_loaded = True
+    try:
+        with open(os.path.expanduser(SESSION_META_CACHE_PATH), 'rb') as f:
+            data = _json_loads(f.read())
+        for path, (ino, cwd, session_id) in data.items():
+            _session_meta_cache.setdefault(path, (ino, cwd, session_id))
+    except (OSError, ValueError, TypeError, AttributeError):
+        pass
+
+
+def _save_session_meta_cache() -> None:
+    """把 session_meta 缓存写回磁盘（临时文件 + os.replace 原子替换）"""
+    cache_path = os.path.expanduser(SESSION_META_CACHE_PATH)
+    tmp_path = f"{cache_path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(_session_meta_cache, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # 缓存写失败不影响主流程
+
+
+def _iter_jsonl(base: str, recent_days: Set[str],
+                cutoff: float) -> Iterator[Tuple[str, os.stat_result]]:
+    """
+    单次递归 scandir 遍历 base，产出 (JSONL 路径, stat)
+    
+    相对路径（YYYY/MM/DD）在 recent_days 中的日期目录产出全部 JSONL，
+    其他目录只产出 mtime >= cutoff 的 JSONL。stat 直接取自 DirEntry。
+    """
+    stack = [(base, '')]
+    while stack:
+        dir_path, rel = stack.pop()
+        recent = rel in recent_days
+        try:
+            it = os.scandir(dir_path)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, f"{rel}/{entry.name}" if rel else entry.name))
+                        continue
+                    if not entry.name.endswith('.jsonl') or not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                if recent or st.st_mtime >= cutoff:
+                    yield entry.path, st
+
+
+def _index_project_dirs(project_dirs: List[str]) -> Dict[str, int]:
+    """{标准化项目路径 → 在 project_dirs 中的序号}"""
+    index: Dict[str, int] = {}
+    for i, project_dir in enumerate(project_dirs):
+        index.setdefault(os.path.normpath(project_dir), i)
+    return index
+
+
+def _match_project(cwd: str, index: Dict[str, int]) -> Optional[int]:
+    """
+    沿 cwd 的祖先路径逐级查表，返回匹配项目的序号
+    
+    多个项目都是 cwd 的祖先时，按 project_dirs 中的顺序取第一个。
+    """
+    best: Optional[int] = None
+    path = os.path.normpath(cwd)
+    while True:
+        i = index.get(path)
+        if i is not None and (best is None or i < best):
+            best = i
+        parent = os.path.dirname(path)
+        if parent == path:
+            return best
+        path = parent
+
+
 def discover_sessions(project_dirs: List[str]) -> Dict[str, SessionInfo]:
     """
     扫描所有 session，按 cwd 分配给各项目
@@ -83,95 +198,76 @@ def discover_sessions(project_dirs: List[str]) -> Dict[str, SessionInfo]:
     """
     global _session_meta_cache
     sessions: Dict[str, SessionInfo] = {}
+    _load_session_meta_cache()
+    # 本轮扫描到的条目；写回时只保留它们，缓存大小随扫描窗口有界
+    seen_meta: Dict[str, Tuple[int, str, Optional[str]]] = {}
+    meta_dirty = False
     
     today = date.today()
     
     codex_sessions_base = os.path.expanduser("~/.codex/sessions")
     
-    # 策略: 先扫最近 7 天的目录，再用 find 补漏最近修改的文件
-    # Codex 会持续写入旧日期目录下的 session 文件
-    scan_dates = [today - timedelta(days=i) for i in range(7)]
+    # 策略: 最近 7 天的日期目录全部纳入，其余目录只取最近 60 分钟内修改过的文件
+    # Codex 会持续写入旧日期目录下的 session 文件（捕获跨日期的活跃 session）
+    recent_days = {f"{today - timedelta(days=i):%Y/%m/%d}" for i in range(7)}
+    cutoff = time.time() - 3600
     
-    seen_paths = set()
-    all_jsonl_paths = []
+    project_index = _index_project_dirs(project_dirs)
+    cwd_matches: Dict[str, Optional[int]] = {}
     
-    # 1. 按日期目录扫描
-    for d in scan_dates:
-        pattern = os.path.join(codex_sessions_base, f"{d:%Y/%m/%d}", "*.jsonl")
-        for p in glob(pattern):
-            if p not in seen_paths:
-                seen_paths.add(p)
-                all_jsonl_paths.append(p)
+    entries = list(_iter_jsonl(codex_sessions_base, recent_days, cutoff))
     
-    # 2. 补漏: 扫描所有最近 60 分钟内修改过的 JSONL（捕获跨日期的活跃 session）
-    try:
-        import subprocess
-        result = subprocess.run(
-            ['find', codex_sessions_base, '-name', '*.jsonl', '-mmin', '-60'],
-            capture_output=True, text=True, timeout=10
-        )
-        if result.returncode == 0:
-            for p in result.stdout.strip().split('\n'):
-                if p and p not in seen_paths:
-                    seen_paths.add(p)
-                    all_jsonl_paths.append(p)
-    except Exception:
-        pass  # find 失败不影响主流程
+    # 缓存未命中（新文件或 inode 变化）的首行并发读取，冷启动时文件多、纯 I/O
+    misses = [
+        path for path, st in entries
+        if _session_meta_cache.get(path, (None,))[0] != st.st_ino
+    ]
+    if len(misses) > META_READ_PARALLEL_MIN:
+        with ThreadPoolExecutor(max_workers=min(META_READ_WORKERS, len(misses))) as executor:
+            fresh_cwds = dict(zip(misses, executor.map(_read_session_meta, misses)))
+    else:
+        fresh_cwds = {path: _read_session_meta(path) for path in misses}
     
-    for jsonl_path in all_jsonl_paths:
-            try:
-                mtime = os.path.getmtime(jsonl_path)
-            except OSError:
-                continue
-            
-            # 缓存 session_meta
-            if jsonl_path not in _session_meta_cache:
-                cwd = _read_session_meta(jsonl_path)
-                if cwd:
-                    _session_meta_cache[jsonl_path] = cwd
-                else:
-                    continue
-            
-            cwd = _session_meta_cache.get(jsonl_path)
+    for jsonl_path, st in entries:
+        mtime = st.st_mtime
+        file_size = st.st_size
+        
+        # 缓存 session_meta（inode 不变则沿用）
+        meta = _session_meta_cache.get(jsonl_path)
+        if meta is None or meta[0] != st.st_ino:
+            cwd = fresh_cwds.get(jsonl_path)
             if not cwd:
                 continue
-            
-            # 匹配项目目录
-            for project_dir in project_dirs:
-                # 标准化路径用于比较
-                norm_cwd = os.path.normpath(cwd)
-                norm_project = os.path.normpath(project_dir)
-                
-                if norm_cwd.startswith(norm_project) or norm_cwd == norm_project:
-                    try:
-                        file_size = os.path.getsize(jsonl_path)
-                    except OSError:
-                        file_size = 0
-                    
-                    session_id = _extract_session_id(jsonl_path)
-                    existing = sessions.get(project_dir)
-                    if not existing:
-                        sessions[project_dir] = SessionInfo(
-                            path=jsonl_path,
-                            cwd=cwd,
-                            mtime=mtime,
-                            file_size=file_size,
-                            session_id=session_id
-                        )
-                    else:
-                        # 优先选最大的 session（最长对话历史）
-                        # 同样大则选最新修改的
-                        if file_size > existing.file_size or (
-                            file_size == existing.file_size and mtime > existing.mtime
-                        ):
-                            sessions[project_dir] = SessionInfo(
-                                path=jsonl_path,
-                                cwd=cwd,
-                                mtime=mtime,
-                                file_size=file_size,
-                                session_id=session_id
-                            )
-                    break  # 一个 session 只匹配一个项目
+            meta = (st.st_ino, cwd, _extract_session_id(jsonl_path))
+            meta_dirty = True
+        seen_meta[jsonl_path] = meta
+        _, cwd, session_id = meta
+        
+        # 匹配项目目录（同一 cwd 只查一次）
+        if cwd not in cwd_matches:
+            cwd_matches[cwd] = _match_project(cwd, project_index)
+        match = cwd_matches[cwd]
+        if match is None:
+            continue
+        project_dir = project_dirs[match]
+        
+        existing = sessions.get(project_dir)
+        # 优先选最大的 session（最长对话历史）
+        # 同样大则选最新修改的
+        if not existing or file_size > existing.file_size or (
+            file_size == existing.file_size and mtime > existing.mtime
+        ):
+            sessions[project_dir] = SessionInfo(
+                path=jsonl_path,
+                cwd=cwd,
+                mtime=mtime,
+                file_size=file_size,
+                session_id=session_id
+            )
+    
+    if meta_dirty or len(seen_meta) != len(_session_meta_cache):
+        _session_meta_cache = seen_meta
+        _save_session_meta_cache()
     
     return sessions
 
@@ -198,52 +294,115 @@ def is_last_message_from_user(session_path: str) -> bool:
         True = 最后是 user message，False = 最后是 assistant 或其他
     """
     try:
-        file_size = os.path.getsize(session_path)
-        read_size = min(file_size, 50 * 1024)  # 读 50KB 足够
-        
         with open(session_path, 'rb') as f:
-            if read_size < file_size:
-                f.seek(-read_size, 2)
-            content = f.read().decode('utf-8', errors='replace')
+            if os.fstat(f.fileno()).st_size == 0:
+                return False
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return _last_message_is_user(mm)
+    except (IOError, OSError, ValueError):
+        return False
+
+
+def _advise_range(mm: mmap.mmap, start: int, end: int) -> None:
+    """提示内核预读 [start, end) 的页（逆向扫描不适合 MADV_SEQUENTIAL）；不支持的平台忽略"""
+    if _MADV_WILLNEED is None:
+        return
+    start -= start % mmap.PAGESIZE  # madvise 要求页对齐
+    try:
+        mm.madvise(_MADV_WILLNEED, start, end - start)
+    except (OSError, ValueError):
+        pass
+
+
+def _last_message_is_user(mm: mmap.mmap) -> bool:
+    """从尾部（最多 USER_SCAN_BYTES）逆向逐行判定，遇到可下结论的记录即停止"""
+    end = len(mm)
+    for line in _iter_tail_lines(mm, max(0, end - USER_SCAN_BYTES), end):
+        try:
+            data = _json_loads(line)
+        except ValueError:
+            continue
         
-        lines = content.strip().split('\n')
+        msg_type = data.get('type', '')
         
-        for line in reversed(lines):
-            if not line.strip():
-                continue
-            try:
-                data = json.loads(line)
-            except json.JSONDecodeError:
-                continue
-            
-            msg_type = data.get('type', '')
-            
-            # user_message 类型
-            if msg_type == 'user_message':
+        # user_message 类型
+        if msg_type == 'user_message':
+            return True
+        
+        # response_item 中的 user message（codex exec resume 写入的格式）
+        if msg_type == 'response_item':
+            payload = data.get('payload', {})
+            if payload.get('role') == 'user' and payload.get('type') == 'message':
                 return True
+            if payload.get('role') == 'assistant':
+                return False
+        
+        # event_msg 跳过继续找
+        if msg_type == 'event_msg':
+            continue
+        
+        # turn_context 跳过
+        if msg_type == 'turn_context':
+            continue
             
-            # response_item 中的 user message（codex exec resume 写入的格式）
-            if msg_type == 'response_item':
-                payload = data.get('payload', {})
-                if payload.get('role') == 'user' and payload.get('type') == 'message':
-                    return True
-                if payload.get('role') == 'assistant':
-                    return False
-            
-            # event_msg 跳过继续找
-            if msg_type == 'event_msg':
-                continue
-            
-            # turn_context 跳过
-            if msg_type == 'turn_context':
+        # 其他类型，不确定
+        break
+    
+    return False
+
+
+def _iter_lines_reverse(buf: Any, start: int, end: int) -> Iterator[bytes]:
+    """从 end 向前逐行产出 buf[start:end] 中的非空行（bytes）"""
+    pos = end
+    while pos > start:
+        nl = buf.rfind(b'\n', start, pos)
+        line = buf[nl + 1 if nl >= 0 else start:pos]
+        if line.strip():
+            yield line
+        pos = nl
+
+
+def _iter_tail_lines(mm: mmap.mmap, start: int, end: int) -> Iterator[bytes]:
+    """
+    从 end 向前逐行产出 mm[start:end] 中的非空行，窗口按 TAIL_SCAN_STEPS 逐步扩大
+    
+    每个窗口对齐到行首，扫描前只预读该窗口；目标在尾部几 KB 时不会触及更早的页。
+    """
+    hi = end
+    for step in TAIL_SCAN_STEPS + (end - start,):
+        lo = end - step
+        if lo <= start:
+            lo = start
+        else:
+            # 窗口起点对齐到下一行行首，跨界的行留给下一个窗口
+            nl = mm.find(b'\n', lo, hi)
+            if nl < 0:
                 continue
-                
-            # 其他类型，不确定
-            break
-        
-        return False
-    except (IOError, OSError):
-        return False
+            lo = nl + 1
+        if lo < hi:
+            _advise_range(mm, lo, hi)
+            yield from _iter_lines_reverse(mm, lo, hi)
+            hi = lo
+        if lo == start:
+            return
+
+
+def _extract_assistant_text(data: Dict[str, Any]) -> Optional[str]:
+    """从 response_item 记录中提取 assistant 的 output_text，不是则返回 None"""
+    if data.get('type') != 'response_item':
+        return None
+    
+    payload = data.get('payload', {})
+    if payload.get('type') != 'message':
+        return None
+    if payload.get('role') != 'assistant':
+        return None
+    
+    texts = [
+        c.get('text', '') for c in payload.get('content', [])
+        if c.get('type') == 'output_text'
+    ]
+    return '\n'.join(texts) if texts else None
 
 
 def read_last_assistant_message(session_path: str, max_chars: int = 4000) -> Optional[str]:
@@ -256,58 +415,46 @@ def read_last_assistant_message(session_path: str, max_chars: int = 4000) -> Opt
     - payload.role = assistant
     - payload.content[].type = output_text
     
+    mmap 文件后从 EOF 向前逐行扫描，只解析同时含 "assistant" / "output_text" /
+    "response_item" 字面量的行，找到第一条即返回。
+    
     Returns:
         最后 assistant 消息的文本，截断到 max_chars
     """
     try:
-        # 从文件尾部读取
-        # 大 session 可能 100+MB，读 200KB 确保覆盖最后的 assistant 消息
-        file_size = os.path.getsize(session_path)
-        read_size = min(file_size, 200 * 1024)
-        
-        with open(session_path, 'rb') as f:
-            if read_size < file_size:
-                f.seek(-read_size, 2)  # 从尾部往前 seek
-            content = f.read().decode('utf-8', errors='replace')
-        
-        # 按行分割，逆序查找
-        lines = content.strip().split('\n')
-        
-        for line in reversed(lines):
-            if not line.strip():
-                continue
-            try:
-                data = json.loads(line)
-            except json.JSONDecodeError:
-                continue
-            
-            if data.get('type') != 'response_item':
-                continue
-            
-            payload = data.get('payload', {})
-            if payload.get('type') != 'message':
-                continue
-            if payload.get('role') != 'assistant':
-                continue
-            
-            # 提取 output_text
-            contents = payload.get('content', [])
-            texts = []
-            for c in contents:
-                if c.get('type') == 'output_text':
-                    texts.append(c.get('text', ''))
-            
-            if texts:
-                full_text = '\n'.join(texts)
-                return full_text[:max_chars] if len(full_text) > max_chars else full_text
-        
+        if os.path.getsize(session_path) == 0:
+            return None
+    except OSError:
         return None
-        
-    except (IOError, OSError) as e:
+    
+    full_text = None
+    try:
+        with open(session_path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = len(mm)
+            start = max(0, end - TAIL_SCAN_BYTES)
+            for line in _iter_tail_lines(mm, start, end):
+                # 字节级预筛：三个字面量缺一即不可能是 assistant 文本消息
+                if (b'"assistant"' not in line or b'"output_text"' not in line
+                        or b'"response_item"' not in line):
+                    continue
+                try:
+                    data = _json_loads(line)
+                except ValueError:
+                    continue
+                full_text = _extract_assistant_text(data)
+                if full_text:
+                    break
+    except (IOError, OSError, ValueError):
         return None
+    
+    if not full_text:
+        return None
+    return full_text[:max_chars] if len(full_text) > max_chars else full_text
 
 
 def clear_cache():
     """清除 session meta 缓存（用于测试）"""
-    global _session_meta_cache
+    global _session_meta_cache, _session_meta_loaded
     _session_meta_cache = {}
+    _session_meta_loaded = False
@@ -9,12 +9,30 @@ State Manager
 import json
 import logging
 import os
+import threading
+import time
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
 
 import yaml
 
+from .parsers import SafeLoader as _SafeLoader
+from .parsers import json_loads as _json_loads
+from .parsers import orjson
+
+# state.json 默认紧凑输出；AUTOPILOT_DEBUG_STATE=1 时缩进便于人工查看
+DEBUG_STATE = os.environ.get("AUTOPILOT_DEBUG_STATE") == "1"
+
+if orjson is not None:
+    def _json_dumps(data: Any) -> bytes:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if DEBUG_STATE else 0)
+else:
+    def _json_dumps(data: Any) -> bytes:
+        if DEBUG_STATE:
+            return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
 logger = logging.getLogger(__name__)
 
 # 默认路径
@@ -83,7 +101,7 @@ class ProjectState:
     daily_sends_date: str = ""
     last_send_at: Optional[str] = None
     consecutive_failures: int = 0
-    last_output_hash: Optional[str] = None
+    last_output_hash: Optional[int] = None
     loop_count: int = 0
     # Phase 2: 任务编排字段
     current_task: Optional[str] = None
@@ -91,6 +109,12 @@ class ProjectState:
     # Phase 3: 多项目调度字段
     lifecycle: str = "enabled"  # disabled, enabled, running, paused, completed, error
     priority: int = 1
+    # 待验证的发送 {path, size, since}，由下个 tick 检查
+    pending_verify: Optional[Dict[str, Any]] = None
+    # 上次读取输出时 session 文件的 mtime_ns，未变化则跳过读取
+    last_session_mtime_ns: Optional[int] = None
+    # last_send_at 的解析结果 (last_send_at, 时间戳)，持久化为 last_send_ts
+    last_send_parsed: Optional[Tuple[str, float]] = field(default=None, repr=False, compare=False)
 
 
 @dataclass
@@ -103,6 +127,8 @@ class GlobalState:
     active_projects: List[str] = field(default_factory=list)
     paused_projects: List[str] = field(default_factory=list)
     project_send_order: List[str] = field(default_factory=list)  # round-robin 记录
+    # 多线程处理项目时保护共享字段（history / 生命周期列表 / send_order），不持久化
+    lock: threading.RLock = field(default_factory=threading.RLock, repr=False, compare=False)
 
 
 def load_config() -> Dict[str, Any]:
@@ -117,8 +143,8 @@ def load_config() -> Dict[str, Any]:
         return {}
     
     try:
-        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
+        with open(CONFIG_PATH, 'rb') as f:
+            config = yaml.load(f, Loader=_SafeLoader)
             return config or {}
     except Exception as e:
         logger.error(f"读取配置文件失败: {e}")
@@ -136,8 +162,8 @@ def load_state() -> GlobalState:
         return GlobalState(started_at=datetime.now().isoformat())
     
     try:
-        with open(STATE_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(STATE_PATH, 'rb') as f:
+            data = _json_loads(f.read())
         
         # 解析项目状态
         projects = {}
@@ -160,7 +186,12 @@ def load_state() -> GlobalState:
                 # Phase 3 字段
                 lifecycle=proj_data.get('lifecycle', 'enabled'),
                 priority=proj_data.get('priority', 1),
+                pending_verify=proj_data.get('pending_verify'),
+                last_session_mtime_ns=proj_data.get('last_session_mtime_ns'),
             )
+            last_send_ts = proj_data.get('last_send_ts')
+            if last_send_ts is not None and projects[name].last_send_at:
+                projects[name].last_send_parsed = (projects[name].last_send_at, last_send_ts)
         
         return GlobalState(
             projects=projects,
@@ -192,8 +223,7 @@ def save_state(state: GlobalState) -> bool:
     os.makedirs(AUTOPILOT_DIR, exist_ok=True)
     
     # 避免 history 无限增长
-    if len(state.history) > MAX_HISTORY_ENTRIES:
-        state.history = state.history[-MAX_HISTORY_ENTRIES:]
+    del state.history[:-MAX_HISTORY_ENTRIES]
     
     # 转换为字典
     data = {
@@ -215,6 +245,8 @@ def save_state(state: GlobalState) -> bool:
             'consecutive_failures': proj.consecutive_failures,
             'last_output_hash': proj.last_output_hash,
             'loop_count': proj.loop_count,
+            'last_session_mtime_ns': proj.last_session_mtime_ns,
+            'last_send_ts': get_last_send_ts(proj),
         }
         
         # Phase 2: 保存任务状态
@@ -229,13 +261,16 @@ def save_state(state: GlobalState) -> bool:
         # Phase 3: 保存生命周期和优先级
         proj_data['lifecycle'] = proj.lifecycle
         proj_data['priority'] = proj.priority
+        if proj.pending_verify:
+            proj_data['pending_verify'] = proj.pending_verify
         
         data['projects'][name] = proj_data
     
     tmp_state_path = f"{STATE_PATH}.tmp"
     try:
-        with open(tmp_state_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        payload = _json_dumps(data)
+        with open(tmp_state_path, 'wb') as f:
+            f.write(payload)
             f.flush()
             os.fsync(f.fileno())
         os.replace(tmp_state_path, STATE_PATH)
@@ -285,9 +320,10 @@ def record_history(state: GlobalState,
     if error:
         entry['error'] = error
     
-    state.history.append(entry)
-    if len(state.history) > MAX_HISTORY_ENTRIES:
-        state.history = state.history[-MAX_HISTORY_ENTRIES:]
+    with state.lock:
+        state.history.append(entry)
+        # 原地删除最旧的条目，不复制整个列表
+        del state.history[:-MAX_HISTORY_ENTRIES]
 
 
 def get_project_state(state: GlobalState, project_dir: str) -> ProjectState:
@@ -310,7 +346,7 @@ def reset_daily_sends_if_needed(proj_state: ProjectState) -> None:
     """
     如果是新的一天，重置每日发送计数
     """
-    today = datetime.now().strftime('%Y-%m-%d')
+    today = date.today().isoformat()
     if proj_state.daily_sends_date != today:
         proj_state.daily_sends = 0
         proj_state.daily_sends_date = today
@@ -320,7 +356,62 @@ def increment_send_count(proj_state: ProjectState) -> None:
     """增加发送计数"""
     reset_daily_sends_if_needed(proj_state)
     proj_state.daily_sends += 1
-    proj_state.last_send_at = datetime.now().isoformat()
+    record_send_time(proj_state)
+
+
+def reserve_daily_send(state: GlobalState, proj_state: ProjectState, max_total: int) -> bool:
+    """
+    在全局每日上限内为项目预占一次发送名额
+    
+    检查与计数在 state.lock 内一起完成，并行处理的项目不会超过 max_total；
+    发送失败时用 release_daily_send 归还，成功后由 record_send_time 记录时间。
+    
+    Returns:
+        已达全局上限返回 False
+    """
+    with state.lock:
+        if get_total_daily_sends(state) >= max_total:
+            return False
+        reset_daily_sends_if_needed(proj_state)
+        proj_state.daily_sends += 1
+    return True
+
+
+def release_daily_send(state: GlobalState, proj_state: ProjectState) -> None:
+    """归还 reserve_daily_send 预占的名额"""
+    with state.lock:
+        if proj_state.daily_sends > 0:
+            proj_state.daily_sends -= 1
+
+
+def record_send_time(proj_state: ProjectState) -> None:
+    """记录上次发送时间"""
+    now = datetime.now()
+    proj_state.last_send_at = now.isoformat()
+    proj_state.last_send_parsed = (proj_state.last_send_at, now.timestamp())
+
+
+def get_last_send_ts(proj_state: ProjectState) -> Optional[float]:
+    """
+    获取上次发送的时间戳
+    
+    解析结果与 last_send_at 字符串一起缓存，字符串不变时不再重复 fromisoformat。
+    
+    Returns:
+        时间戳；从未发送或格式无效时返回 None
+    """
+    last_send_at = proj_state.last_send_at
+    if not last_send_at:
+        return None
+    parsed = proj_state.last_send_parsed
+    if parsed is not None and parsed[0] == last_send_at:
+        return parsed[1]
+    try:
+        ts = datetime.fromisoformat(last_send_at).timestamp()
+    except ValueError:
+        return None
+    proj_state.last_send_parsed = (last_send_at, ts)
+    return ts
 
 
 def check_cooldown(proj_state: ProjectState, cooldown_seconds: int) -> bool:
@@ -334,15 +425,10 @@ def check_cooldown(proj_state: ProjectState, cooldown_seconds: int) -> bool:
     Returns:
         是否在冷却期（True = 需要等待）
     """
-    if not proj_state.last_send_at:
-        return False
-    
-    try:
-        last_send = datetime.fromisoformat(proj_state.last_send_at)
-        elapsed = (datetime.now() - last_send).total_seconds()
-        return elapsed < cooldown_seconds
-    except ValueError:
+    last_send_ts = get_last_send_ts(proj_state)
+    if last_send_ts is None:
         return False
+    return time.time() - last_send_ts < cooldown_seconds
 
 
 def check_daily_limit(proj_state: ProjectState, max_daily_sends: int) -> bool:
@@ -362,7 +448,7 @@ def check_daily_limit(proj_state: ProjectState, max_daily_sends: int) -> bool:
 
 def get_total_daily_sends(state: GlobalState) -> int:
     """获取所有项目的今日总发送次数"""
-    today = datetime.now().strftime('%Y-%m-%d')
+    today = date.today().isoformat()
     total = 0
     for proj in state.projects.values():
         if proj.daily_sends_date == today:
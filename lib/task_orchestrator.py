@@ -8,7 +8,6 @@ Layer 3: Task Orchestrator
 """
 
 import logging
-import os
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
@@ -16,6 +15,8 @@ from typing import Any, Dict, List, Optional, Set, Tuple
 
 import yaml
 
+from .parsers import SafeLoader as _SafeLoader
+
 logger = logging.getLogger(__name__)
 
 
@@ -106,6 +107,7 @@ class TasksConfig:
     enabled: bool = True
     priority: int = 1
     defaults: Dict[str, Any] = field(default_factory=dict)
+    overrides: Dict[str, Any] = field(default_factory=dict)
     tasks: List[Task] = field(default_factory=list)
     
     def get_default(self, key: str, fallback: Any = None) -> Any:
@@ -113,6 +115,19 @@ class TasksConfig:
         return self.defaults.get(key, fallback)
 
 
+# format_task_progress 用的状态图标与 21 档进度条（0~20 格）
+_STATUS_EMOJI = {
+    "PENDING": "⏳",
+    "READY": "🔜",
+    "RUNNING": "🔄",
+    "VERIFYING": "🔍",
+    "COMPLETED": "✅",
+    "FAILED": "❌",
+    "BLOCKED": "⏸",
+}
+_PROGRESS_BARS = tuple("█" * i + "░" * (20 - i) for i in range(21))
+
+
 class CyclicDependencyError(Exception):
     """循环依赖错误"""
     pass
@@ -128,13 +143,10 @@ def load_tasks(tasks_yaml_path: str) -> Optional[TasksConfig]:
     Returns:
         TasksConfig 对象，如果文件不存在或解析失败返回 None
     """
-    if not os.path.exists(tasks_yaml_path):
-        logger.warning(f"tasks.yaml 不存在: {tasks_yaml_path}")
-        return None
-    
     try:
-        with open(tasks_yaml_path, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
+        # 以字节读入，由 YAML 解析器自行按 UTF-8 解码
+        with open(tasks_yaml_path, 'rb') as f:
+            data = yaml.load(f, Loader=_SafeLoader)
         
         if not data:
             logger.warning(f"tasks.yaml 为空: {tasks_yaml_path}")
@@ -149,6 +161,7 @@ def load_tasks(tasks_yaml_path: str) -> Optional[TasksConfig]:
             enabled=project_data.get("enabled", True),
             priority=project_data.get("priority", 1),
             defaults=data.get("defaults", {}),
+            overrides=project_data.get("overrides", {}),
         )
         
         # 解析任务列表
@@ -160,6 +173,10 @@ def load_tasks(tasks_yaml_path: str) -> Optional[TasksConfig]:
         logger.info(f"加载了 {len(config.tasks)} 个任务从 {tasks_yaml_path}")
         return config
     
+    except FileNotFoundError:
+        # 不预先 exists 探测，直接由 open 失败得知，少一次系统调用
+        logger.warning(f"tasks.yaml 不存在: {tasks_yaml_path}")
+        return None
     except yaml.YAMLError as e:
         logger.error(f"解析 tasks.yaml 失败: {e}")
         return None
@@ -181,41 +198,36 @@ def detect_cyclic_dependencies(tasks: List[Task]) -> Optional[List[str]]:
     # 构建任务 ID 映射
     task_map = {t.id: t for t in tasks}
     
-    # DFS 检测循环
+    # DFS 检测循环（显式栈迭代，依赖链很长时也不会触及递归上限）
     WHITE, GRAY, BLACK = 0, 1, 2
     color: Dict[str, int] = {t.id: WHITE for t in tasks}
     path: List[str] = []
     
-    def dfs(task_id: str) -> Optional[List[str]]:
-        if task_id not in task_map:
-            return None  # 依赖的任务不存在，忽略
-        
-        if color[task_id] == GRAY:
-            # 找到循环
-            cycle_start = path.index(task_id)
-            return path[cycle_start:] + [task_id]
-        
-        if color[task_id] == BLACK:
-            return None
-        
-        color[task_id] = GRAY
-        path.append(task_id)
-        
-        task = task_map[task_id]
-        for dep_id in task.depends_on:
-            result = dfs(dep_id)
-            if result:
-                return result
-        
-        path.pop()
-        color[task_id] = BLACK
-        return None
-    
     for task in tasks:
-        if color[task.id] == WHITE:
-            cycle = dfs(task.id)
-            if cycle:
-                return cycle
+        if color[task.id] != WHITE:
+            continue
+        
+        color[task.id] = GRAY
+        path.append(task.id)
+        stack = [(task.id, iter(task_map[task.id].depends_on))]
+        while stack:
+            task_id, deps = stack[-1]
+            for dep_id in deps:
+                if dep_id not in task_map:
+                    continue  # 依赖的任务不存在，忽略
+                if color[dep_id] == GRAY:
+                    # 找到循环
+                    return path[path.index(dep_id):] + [dep_id]
+                if color[dep_id] == WHITE:
+                    color[dep_id] = GRAY
+                    path.append(dep_id)
+                    stack.append((dep_id, iter(task_map[dep_id].depends_on)))
+                    break
+            else:
+                # 所有依赖处理完毕
+                stack.pop()
+                path.pop()
+                color[task_id] = BLACK
     
     return None
 
@@ -287,12 +299,16 @@ def build_prompt(
     
     # 2. 前置上下文：之前任务的关键成果
     context_items = []
+    task_names: Optional[Dict[str, str]] = None
     for dep_id in task.depends_on:
         dep_state = task_states.get(dep_id)
         if dep_state and dep_state.codex_summary:
-            # 找到依赖任务的名称
-            dep_task = next((t for t in tasks if t.id == dep_id), None)
-            dep_name = dep_task.name if dep_task else dep_id
+            # 找到依赖任务的名称（首次需要时建一次 ID → 名称索引，重复 ID 取第一个）
+            if task_names is None:
+                task_names = {}
+                for t in tasks:
+                    task_names.setdefault(t.id, t.name)
+            dep_name = task_names.get(dep_id, dep_id)
             context_items.append(f"- {dep_name}: {dep_state.codex_summary}")
     
     if context_items:
@@ -340,11 +356,7 @@ def dispatch_next_task(
     
     if not ready_tasks:
         # 检查是否所有任务都完成了
-        all_completed = all(
-            task_states.get(t.id, TaskStateInfo()).status == "COMPLETED"
-            for t in tasks
-        )
-        if all_completed:
+        if get_all_completed(tasks, task_states):
             logger.info("所有任务已完成！")
         else:
             # 有任务被 BLOCKED 或依赖未满足
@@ -372,9 +384,10 @@ def dispatch_next_task(
     
     state = task_states[next_task.id]
     state.status = "RUNNING"
-    state.started_at = datetime.now().isoformat()
+    now = datetime.now().isoformat()
+    state.started_at = now
     state.sends += 1
-    state.last_send_at = datetime.now().isoformat()
+    state.last_send_at = now
     
     logger.info(f"派发任务: {next_task.name}")
     return next_task, prompt
@@ -422,10 +435,11 @@ def mark_task_running(
     
     state = task_states[task_id]
     state.status = "RUNNING"
+    now = datetime.now().isoformat()
     if not state.started_at:
-        state.started_at = datetime.now().isoformat()
+        state.started_at = now
     state.sends += 1
-    state.last_send_at = datetime.now().isoformat()
+    state.last_send_at = now
 
 
 def mark_task_failed(
@@ -503,27 +517,18 @@ def format_task_progress(
     completed = 0
     
     for task in tasks:
-        state = task_states.get(task.id, TaskStateInfo())
-        status_emoji = {
-            "PENDING": "⏳",
-            "READY": "🔜",
-            "RUNNING": "🔄",
-            "VERIFYING": "🔍",
-            "COMPLETED": "✅",
-            "FAILED": "❌",
-            "BLOCKED": "⏸",
-        }.get(state.status, "❓")
+        state = task_states.get(task.id)
+        status = state.status if state else "PENDING"
         
-        if state.status == "COMPLETED":
+        if status == "COMPLETED":
             completed += 1
         
-        lines.append(f"{status_emoji} {task.name} [{state.status}]")
+        lines.append(f"{_STATUS_EMOJI.get(status, '❓')} {task.name} [{status}]")
     
     # 进度条
     total = len(tasks)
     progress_pct = int(completed / total * 100) if total > 0 else 0
-    bar_filled = int(completed / total * 20) if total > 0 else 0
-    bar = "█" * bar_filled + "░" * (20 - bar_filled)
+    bar = _PROGRESS_BARS[int(completed / total * 20) if total > 0 else 0]
     
     header = f"进度: {bar} {progress_pct}% ({completed}/{total})\n\n"
     return header + "\n".join(lines)
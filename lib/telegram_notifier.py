@@ -7,7 +7,8 @@ Telegram Notifier
 
 import logging
 import re
-from typing import Optional
+import threading
+from typing import List, Optional, Tuple
 
 import requests
 
@@ -61,6 +62,8 @@ class TelegramNotifier:
         self.bot_token = bot_token
         self.chat_id = chat_id
         self.api_base = f"https://api.telegram.org/bot{bot_token}"
+        # 复用连接（keep-alive），多条消息只做一次 TLS 握手
+        self.session = requests.Session()
     
     def send_with_parse_mode(self, text: str, parse_mode: Optional[str] = "MarkdownV2") -> bool:
         """
@@ -84,7 +87,7 @@ class TelegramNotifier:
             payload["parse_mode"] = parse_mode
         
         try:
-            response = requests.post(url, json=payload, timeout=30)
+            response = self.session.post(url, json=payload, timeout=30)
             response.raise_for_status()
             return True
         except requests.RequestException as e:
@@ -129,6 +132,70 @@ class TelegramNotifier:
         return self.send_with_parse_mode(text, None)
 
 
+# Telegram 单条消息的长度上限（字符）
+TELEGRAM_MAX_CHARS = 4096
+
+
+class BufferedNotifier:
+    """
+    缓冲通知器：tick 内只入队，flush 时合并成尽量少的消息发送
+    
+    接口与 TelegramNotifier 的 notify / send_simple 一致，可直接替换传入处理流程。
+    相邻的同类消息（纯文本 / MarkdownV2）按入队顺序以空行拼接，
+    不超过 TELEGRAM_MAX_CHARS 时合为一条，通常一轮只需一次请求。
+    """
+    
+    def __init__(self, notifier: TelegramNotifier):
+        self.notifier = notifier
+        self._pending: List[Tuple[str, bool]] = []  # (text, 是否纯文本)
+        self._lock = threading.Lock()
+    
+    def notify(self, text: str) -> bool:
+        """入队（MarkdownV2 容错发送），返回 True 表示已接收"""
+        with self._lock:
+            self._pending.append((text, False))
+        return True
+    
+    def send_simple(self, text: str) -> bool:
+        """入队（纯文本发送），返回 True 表示已接收"""
+        with self._lock:
+            self._pending.append((text, True))
+        return True
+    
+    def _send_batch(self, texts: List[str], simple: bool) -> int:
+        text = "\n\n".join(texts)
+        sent = self.notifier.send_simple(text) if simple else self.notifier.notify(text)
+        return len(texts) if sent else 0
+    
+    def flush(self) -> int:
+        """
+        合并发送所有缓冲的消息
+        
+        Returns:
+            发送成功的条数（按入队的消息计）
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        
+        sent = 0
+        batch: List[str] = []
+        batch_simple = True
+        batch_len = 0
+        for text, simple in pending:
+            if batch and (simple != batch_simple
+                          or batch_len + 2 + len(text) > TELEGRAM_MAX_CHARS):
+                sent += self._send_batch(batch, batch_simple)
+                batch, batch_len = [], 0
+            if batch:
+                batch_len += 2
+            batch.append(text)
+            batch_simple = simple
+            batch_len += len(text)
+        if batch:
+            sent += self._send_batch(batch, batch_simple)
+        return sent
+
+
 def create_notifier_from_config(config: dict) -> Optional[TelegramNotifier]:
     """
     从配置创建通知器
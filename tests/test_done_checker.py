@@ -9,6 +9,7 @@
 """
 
 import os
+import subprocess
 import sys
 import tempfile
 import unittest
@@ -19,6 +20,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from lib.done_checker import (
     CheckResult,
     DoneResult,
+    PersistentShell,
     check_command_condition,
     check_done_conditions,
     check_file_condition,
@@ -126,6 +128,17 @@ class TestFileCondition(unittest.TestCase):
         
         self.assertTrue(result.passed)
     
+    def test_directory_not_file(self):
+        """测试路径是目录时不通过"""
+        os.makedirs(os.path.join(self.temp_dir, "docs"))
+        
+        result = check_file_condition(
+            {"path": "docs", "min_size": 0},
+            self.temp_dir
+        )
+        
+        self.assertFalse(result.passed)
+    
     def test_nested_path(self):
         """测试嵌套路径"""
         self._create_file("src/app/page.tsx", "export default function Page() {}")
@@ -209,6 +222,20 @@ class TestGlobCondition(unittest.TestCase):
         self.assertTrue(result.passed)
         self.assertIn("1", result.details)  # 只有 1 个有效
     
+    def test_glob_skips_hidden(self):
+        """测试通配符不匹配隐藏文件/目录（与 glob 一致）"""
+        self._create_file("src/.cache/a.ts", "A" * 100)
+        self._create_file("src/.b.ts", "B" * 100)
+        self._create_file("src/c.ts", "C" * 100)
+        
+        result = check_glob_condition(
+            {"pattern": "src/**/*.ts", "min_count": 2},
+            self.temp_dir
+        )
+        
+        self.assertFalse(result.passed)
+        self.assertIn("找到 1 个", result.details)
+    
     def test_glob_no_matches(self):
         """测试没有匹配文件"""
         result = check_glob_condition(
@@ -274,6 +301,61 @@ class TestCommandCondition(unittest.TestCase):
         """测试命令超时（跳过，因为需要长时间等待）"""
         # 这个测试会太慢，跳过
         pass
+    
+    def test_persistent_shell(self):
+        """测试常驻 shell：退出码、输出分离，命令之间互不影响"""
+        shell = PersistentShell(self.temp_dir)
+        try:
+            result = shell.run("echo out; echo err >&2; exit 3")
+            self.assertEqual(result.returncode, 3)
+            self.assertEqual(result.stdout, b"out\n")
+            self.assertEqual(result.stderr, b"err\n")
+            
+            # 前一条的 exit / cd 不影响后续命令
+            shell.run("cd / # 注释")
+            result = shell.run("pwd")
+            self.assertEqual(result.returncode, 0)
+            self.assertEqual(os.path.realpath(result.stdout.decode().strip()),
+                             os.path.realpath(self.temp_dir))
+            
+            result = check_command_condition(
+                {"cmd": "test -d {project_dir}", "expect_exit": 0},
+                self.temp_dir, shell
+            )
+            self.assertTrue(result.passed)
+        finally:
+            shell.close()
+    
+    def test_persistent_shell_syntax_error(self):
+        """测试常驻 shell：未闭合引号 / 多余的 ) 只让当前命令失败，不挂起也不杀掉 shell"""
+        shell = PersistentShell(self.temp_dir)
+        try:
+            for cmd in ("echo 'unterminated", "echo hi )"):
+                result = shell.run(cmd, timeout=5)
+                self.assertEqual(result.returncode, 2)
+                self.assertTrue(result.stderr)
+                
+                result = shell.run("echo ok", timeout=5)
+                self.assertEqual(result.returncode, 0)
+                self.assertEqual(result.stdout, b"ok\n")
+        finally:
+            shell.close()
+    
+    def test_persistent_shell_restart(self):
+        """测试常驻 shell 退出后下一条命令自动重启"""
+        shell = PersistentShell(self.temp_dir)
+        try:
+            with self.assertRaises(subprocess.TimeoutExpired):
+                shell.run("sleep 5", timeout=0.2)
+            self.assertFalse(shell.alive)
+            
+            result = check_command_condition(
+                {"cmd": "pwd", "expect_exit": 0}, self.temp_dir, shell
+            )
+            self.assertTrue(result.passed)
+            self.assertTrue(shell.alive)
+        finally:
+            shell.close()
 
 
 class TestCheckDoneConditions(unittest.TestCase):
@@ -236,6 +236,26 @@ elif option == 'B':
 代码已经写好了"""
         # 代码块应该被忽略，但当前实现没有处理
         # 可以在后续版本中改进
+    
+    def test_lowercase_exception_in_completion(self):
+        """测试完成消息中的小写 exception / traceback 不被误判为错误"""
+        text = "Added exception handling and removed the traceback printing. 已完成"
+        self.assertEqual(analyze_intent(text), Intent.TASK_COMPLETE)
+    
+    def test_other_spelling_in_quote_still_error(self):
+        """测试同一关键词的其他写法出现在引用/注释中时不影响真实错误"""
+        for text in (
+            "Error: boom\n# error comment",
+            "> Error in quote\nerror happened here",
+            "The build FAILED\n> failed previously",
+            "ERROR: x\n// Error y",
+        ):
+            self.assertEqual(analyze_intent(text), Intent.ERROR, text)
+    
+    def test_mixed_case_error_still_detected(self):
+        """测试多种写法并存的关键词仍不区分大小写"""
+        text = "Build FAILED with 2 warnings"
+        self.assertEqual(analyze_intent(text), Intent.ERROR)
 
 
 if __name__ == '__main__':
@@ -6,10 +6,13 @@
 
 import json
 import os
+import shutil
 import sys
 import tempfile
 import time
 import unittest
+from datetime import date
+from unittest import mock
 
 # 添加 lib 到 path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -20,7 +23,9 @@ from lib.session_monitor import (
     SessionInfo,
     SessionState,
     clear_cache,
+    discover_sessions,
     get_session_state,
+    is_last_message_from_user,
     read_last_assistant_message,
 )
 
@@ -247,6 +252,108 @@ class TestReadLastAssistantMessage(unittest.TestCase):
         
         result = read_last_assistant_message(self.jsonl_path)
         self.assertEqual(result, "你好，世界！这是一条中文消息。")
+    
+    def _append_jsonl(self, lines):
+        """追加写入 JSONL 文件"""
+        with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+            for line in lines:
+                f.write(json.dumps(line) + '\n')
+    
+    def _assistant(self, text):
+        return {"type": "response_item", "payload": {
+            "type": "message",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": text}]
+        }}
+    
+    def test_last_message_from_user(self):
+        """测试尾部逆向判定最后一条是否为 user message（跳过 event_msg）"""
+        user = {"type": "response_item", "payload": {
+            "type": "message", "role": "user", "content": []}}
+        event = {"type": "event_msg", "payload": {"type": "token_count"}}
+        self._write_jsonl([{"type": "session_meta", "payload": {"cwd": "/test"}},
+                           self._assistant("Done"), user, event])
+        self.assertTrue(is_last_message_from_user(self.jsonl_path))
+        
+        self._append_jsonl([self._assistant("Reply"), event])
+        self.assertFalse(is_last_message_from_user(self.jsonl_path))
+        
+        self._write_jsonl([])
+        self.assertFalse(is_last_message_from_user(self.jsonl_path))
+
+
+
+class TestDiscoverSessions(unittest.TestCase):
+    """测试 session 发现与项目匹配"""
+    
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.day_dir = os.path.join(
+            self.home, ".codex", "sessions", f"{date.today():%Y/%m/%d}"
+        )
+        os.makedirs(self.day_dir)
+        clear_cache()
+    
+    def tearDown(self):
+        shutil.rmtree(self.home)
+        clear_cache()
+    
+    def _write_session(self, name, cwd, extra_lines=0):
+        path = os.path.join(self.day_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"type": "session_meta", "payload": {"cwd": cwd}}) + '\n')
+            for _ in range(extra_lines):
+                f.write(json.dumps({"type": "event_msg"}) + '\n')
+        return path
+    
+    def _discover(self, project_dirs):
+        with mock.patch.dict(os.environ, {"HOME": self.home}):
+            return discover_sessions(project_dirs)
+    
+    def test_match_subdirectory_cwd(self):
+        """测试 cwd 为项目子目录时归属该项目"""
+        path = self._write_session("a.jsonl", "/work/proj/src")
+        sessions = self._discover(["/work/proj", "/work/other"])
+        self.assertEqual(list(sessions), ["/work/proj"])
+        self.assertEqual(sessions["/work/proj"].path, path)
+    
+    def test_sibling_prefix_not_matched(self):
+        """测试同前缀的兄弟目录不会误匹配"""
+        self._write_session("a.jsonl", "/work/proj-old")
+        self.assertEqual(self._discover(["/work/proj"]), {})
+    
+    def test_prefer_largest_session(self):
+        """测试同一项目多个 session 时取最大的"""
+        self._write_session("small.jsonl", "/work/proj")
+        big = self._write_session("big.jsonl", "/work/proj", extra_lines=5)
+        sessions = self._discover(["/work/proj"])
+        self.assertEqual(sessions["/work/proj"].path, big)
+        self.assertEqual(sessions["/work/proj"].file_size, os.path.getsize(big))
+    
+    def test_old_day_dir_only_recent_files(self):
+        """测试 7 天前的日期目录只纳入最近 60 分钟内修改过的 session"""
+        self.day_dir = os.path.join(self.home, ".codex", "sessions", "2020/01/01")
+        os.makedirs(self.day_dir)
+        stale = self._write_session("stale.jsonl", "/work/stale")
+        old = time.time() - 2 * 3600
+        os.utime(stale, (old, old))
+        fresh = self._write_session("fresh.jsonl", "/work/proj")
+        sessions = self._discover(["/work/proj", "/work/stale"])
+        self.assertEqual(list(sessions), ["/work/proj"])
+        self.assertEqual(sessions["/work/proj"].path, fresh)
+    
+    def test_session_meta_cache_persisted(self):
+        """测试 session_meta 缓存落盘，进程重启（清空内存缓存）后无需重读首行"""
+        path = self._write_session(
+            "rollout-019c36a5-b6ef-75f0-b9f6-0bcee9c3e085.jsonl", "/work/proj")
+        self._discover(["/work/proj"])
+        clear_cache()
+        with mock.patch("lib.session_monitor._read_session_meta") as read_meta:
+            sessions = self._discover(["/work/proj"])
+        read_meta.assert_not_called()
+        self.assertEqual(sessions["/work/proj"].path, path)
+        self.assertEqual(sessions["/work/proj"].session_id,
+                         "019c36a5-b6ef-75f0-b9f6-0bcee9c3e085")
 
 
 if __name__ == '__main__':
@@ -18,11 +18,14 @@ from lib.state_manager import (
     ProjectState,
     check_cooldown,
     check_daily_limit,
+    get_last_send_ts,
     get_project_state,
     get_total_daily_sends,
     increment_send_count,
     load_state,
     record_history,
+    release_daily_send,
+    reserve_daily_send,
     reset_daily_sends_if_needed,
     save_state,
 )
@@ -169,6 +172,22 @@ class TestGlobalState(unittest.TestCase):
         total = get_total_daily_sends(state)
         self.assertEqual(total, 30)  # 10 + 20，不包括过去的
     
+    def test_reserve_daily_send_concurrent(self):
+        """测试并发预占名额不超过全局上限"""
+        from concurrent.futures import ThreadPoolExecutor
+        state = GlobalState()
+        projs = [get_project_state(state, f"/proj{i}") for i in range(8)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            reserved = list(executor.map(lambda p: reserve_daily_send(state, p, 3), projs))
+        self.assertEqual(sum(reserved), 3)
+        self.assertEqual(get_total_daily_sends(state), 3)
+        
+        # 发送失败归还名额后可再次预占
+        release_daily_send(state, projs[reserved.index(True)])
+        self.assertEqual(get_total_daily_sends(state), 2)
+        self.assertTrue(reserve_daily_send(state, projs[0], 3))
+        self.assertFalse(reserve_daily_send(state, projs[1], 3))
+    
     def test_record_history(self):
         """测试记录历史"""
         state = GlobalState()
@@ -217,6 +236,37 @@ class TestStatePersistence(unittest.TestCase):
         self.assertEqual(loaded.projects["/test"].daily_sends, 5)
         self.assertEqual(len(loaded.history), 1)
     
+    def test_pending_verify_persisted(self):
+        """测试待验证发送跨 tick 保存"""
+        pending = {"path": "/tmp/s.jsonl", "size": 10, "since": 1700000000.0}
+        state = GlobalState()
+        state.projects["/test"] = ProjectState(pending_verify=pending)
+        state.projects["/idle"] = ProjectState()
+        
+        self.assertTrue(save_state(state))
+        
+        loaded = load_state()
+        self.assertEqual(loaded.projects["/test"].pending_verify, pending)
+        self.assertIsNone(loaded.projects["/idle"].pending_verify)
+    
+    def test_last_send_ts_persisted(self):
+        """测试上次发送时间戳随状态保存，加载后无需重新解析"""
+        state = GlobalState()
+        proj = ProjectState()
+        increment_send_count(proj)
+        state.projects["/test"] = proj
+        
+        self.assertTrue(save_state(state))
+        
+        loaded = load_state().projects["/test"]
+        self.assertEqual(loaded.last_send_parsed, proj.last_send_parsed)
+        self.assertEqual(get_last_send_ts(loaded), proj.last_send_parsed[1])
+        
+        # last_send_at 被改写时缓存失效
+        loaded.last_send_at = "2026-02-07T01:00:00"
+        self.assertEqual(get_last_send_ts(loaded),
+                         datetime(2026, 2, 7, 1, 0).timestamp())
+    
     def test_load_nonexistent_state(self):
         """测试加载不存在的状态文件"""
         import lib.state_manager as sm
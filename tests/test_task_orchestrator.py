@@ -147,6 +147,24 @@ tasks:
         config = load_tasks(path)
         
         self.assertTrue(config.tasks[0].requires_human_review)
+    
+    def test_load_overrides(self):
+        """测试解析 project.overrides"""
+        yaml_content = """
+project:
+  name: "Test"
+  dir: "/test"
+  overrides:
+    cooldown: 60
+
+tasks:
+  - id: "task-1"
+    name: "任务"
+    prompt: "说明"
+"""
+        path = self._write_yaml(yaml_content)
+        config = load_tasks(path)
+        self.assertEqual(config.overrides, {"cooldown": 60})
 
 
 class TestDependencyResolution(unittest.TestCase):